@@ -0,0 +1,187 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from PIL import Image
+from map_config import (
+	dpi, export_dpi, tile_provider, tile_cache_path, tile_cache_limit, classification_scheme,
+	classification_k, geo_path, data_path, pr_data_path, logo_path, arrow_path, batch_export_path,
+	print_usetex, label_overrides_path, export_manifest_path, batch_atlas_path, data_cache_dir
+)
+from map_data import (
+	read_layers, lad_index, authority_bounds, view_rows, reprojections, cache_signature, national_classifications, 
+	read_label_overrides
+)
+from map_tiles import TileStore, stitch_tiles
+from map_render import (
+	coa_options, text_rc, layer_colors, legend_labels, legend_colors, geom_paths, place_labels, table_widths,
+	init_worker, render_layer, render_atlas, layer_fingerprints, atlas_fingerprint, ExportManifest
+)
+
+figsize = (12, 9)
+
+############################
+#Overlays
+############################
+#Logo and Arrow at their default GUI placement, as figure fractions for any export dpi
+def default_overlays():
+	frame_width, frame_height = figsize[0] * dpi, figsize[1] * dpi
+	overlays = []
+	for path, width_, corner in [(logo_path, 100, 'lower right'), (arrow_path, 65, 'upper right')]:
+		#Source pixels kept, Agg resamples to the placed size
+		image = Image.open(path)
+		width, height = image.size
+		height_ = round((height / width) * width_)
+		image = image.convert('RGBA')
+		x = frame_width - width_ - 5
+		y = 5 if corner == 'lower right' else frame_height - height_ - 5
+		overlays.append((np.asarray(image), [x / frame_width, y / frame_height, width_ / frame_width, height_ / frame_height]))
+
+	return overlays
+
+############################
+#Authority Figures
+############################
+#Worker State - national layers shared by every authority
+_batch = None
+
+def init_batch(state):
+	global _batch
+	_batch = dict(state)
+	_batch['tile_store'] = TileStore(path=tile_cache_path, limit=tile_cache_limit)
+
+#Picklable figure spec for one authority, see map_render.build_figure
+def authority_spec(name):
+	wards = _batch['wards'].iloc[_batch['index'][name]]
+	bounds = authority_bounds(wards)
+	#COAs within view extent, as cached for the GUI
+	coa_geoms = _batch['coa_geoms']
+	rows = view_rows(coa_geoms, bounds)
+	table_data = wards.loc[:, ['Ward_ID', 'WardName']].rename(
+		columns={'Ward_ID': 'Ward ID', 'WardName': 'Ward Name'}
+	).sort_values(by='Ward ID', ascending=True)
+	image, extent = stitch_tiles(_batch['tile_store'], *bounds, tile_provider)
+	#Ward labels as placed in the GUI, including dragged positions
+	label_overrides = read_label_overrides(label_overrides_path, name)
+	ward_ids = [str(x) for x in wards['Ward_ID']]
+	label_points = wards.representative_point()
+	label_positions = place_labels(
+		ward_ids, np.column_stack([label_points.x, label_points.y]), 
+		scale=(bounds[2] - bounds[0]) / (figsize[0] * 72), 
+		fixed={i: label_overrides[x] for i, x in enumerate(ward_ids) if x in label_overrides}
+	)
+
+	return {
+		'rc': text_rc['usetex' if print_usetex else 'mathtext'], 'figsize': figsize, 'dpi': dpi,
+		'xlim': (bounds[0], bounds[2]), 'ylim': (bounds[1], bounds[3]),
+		'basemap': (image, extent),
+		'coa_paths': geom_paths(coa_geoms.iloc[rows]),
+		'ward_paths': geom_paths(wards['geometry']),
+		'labels': [(ward_id, x, y) for ward_id, (x, y) in zip(ward_ids, label_positions)],
+		'table': {
+			'cell_text': table_data.values.tolist(), 'col_labels': list(table_data.columns),
+			'col_widths': table_widths(table_data.values, table_data.columns), 'loc': 'lower left', 
+			'visible': True
+		},
+		'scalebar': {'location': 'lower center', 'visible': True},
+		'overlays': _batch['overlays'],
+		'colors': {option: colors[rows] for option, colors in _batch['colors'].items()},
+		'legends': _batch['legends'],
+		'legend_loc': 'upper left'
+	}
+
+#Every changed output for one authority, figure only built when an output needs it
+def render_authority(name):
+	start = time.perf_counter()
+	spec = authority_spec(name)
+	#One PDF atlas of every layer, or a file per layer
+	if _batch['atlas']:
+		fingerprint = atlas_fingerprint(spec, coa_options, _batch['export_dpi'])
+		outputs = [(coa_options, _batch['out'].format(name), fingerprint)]
+		render = render_atlas
+	else:
+		fingerprints = layer_fingerprints(spec, coa_options, _batch['export_dpi'])
+		outputs = [(option, _batch['out'].format(name, option), fingerprints[option]) for option in coa_options]
+		render = render_layer
+	stale = [x for x in outputs if not _batch['manifest'].current(x[1], x[2])]
+	if stale: init_worker(spec)
+	built = time.perf_counter()
+	rendered = {}
+	for options, path, fingerprint in stale:
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		render(options, path, _batch['export_dpi'])
+		rendered[path] = fingerprint
+
+	return name, built - start, time.perf_counter() - built, rendered, len(outputs)
+
+############################
+#Command Line
+############################
+def main():
+	parser = argparse.ArgumentParser(description='Export every COA layer for a list of local authorities.')
+	parser.add_argument('authorities', nargs='*', help='LAD11NM names, all authorities if omitted')
+	parser.add_argument('--workers', type=int, default=os.cpu_count())
+	parser.add_argument('--dpi', type=int, default=export_dpi)
+	parser.add_argument('--atlas', action='store_true', help='every layer as one multi-page PDF per authority')
+	parser.add_argument('--out', help='path formatted with (authority, layer), or (authority) with --atlas')
+	args = parser.parse_args()
+
+	#Read national layers once
+	start = time.perf_counter()
+	wards, coas = read_layers(geo_path, data_path, pr_data_path, coa_options[1:])
+	index = lad_index(wards)
+	names = args.authorities or sorted(index)
+	unknown = [name for name in names if name not in index]
+	if unknown: parser.error('unknown authorities: {0}'.format(', '.join(unknown)))
+
+	#National breaks, shared with the GUI through the data cache
+	classifications = national_classifications(
+		coas, coa_options[1:], data_cache_dir,
+		signature=cache_signature(
+			geo_path, data_path, pr_data_path, coa_options[1:], classification_scheme, classification_k
+		),
+		scheme=classification_scheme, k=classification_k
+	)
+	get_class = lambda option: classifications[(option, classification_scheme, classification_k)]
+	state = {
+		'wards': wards, 'index': index,
+		'coa_geoms': coas.geometry,
+		'colors': {option: layer_colors(get_class(option), option) for option in coa_options[1:]},
+		'legends': {
+			option: (legend_labels(get_class(option), option), legend_colors(option)) \
+			for option in coa_options[1:]
+		},
+		'overlays': default_overlays(), 'export_dpi': args.dpi, 'atlas': args.atlas,
+		'out': args.out or (batch_atlas_path if args.atlas else batch_export_path),
+		'manifest': ExportManifest(export_manifest_path)
+	}
+	print('Loaded {0} authorities in {1:.1f}s, reprojected {2}'.format(
+		len(index), time.perf_counter() - start, dict(reprojections)
+	))
+
+	#Fan out authorities across cores
+	timings = []
+	manifest = state['manifest']
+	with ProcessPoolExecutor(max_workers=args.workers, initializer=init_batch, initargs=(state,)) as executor:
+		futures = [executor.submit(render_authority, name) for name in names]
+		for future in as_completed(futures):
+			name, build, render, rendered, outputs = future.result()
+			for path, fingerprint in rendered.items(): manifest.record(path, fingerprint)
+			manifest.save()
+			timings.append((name, build, render, len(rendered), outputs))
+			print('{0:<40} build {1:6.1f}s  render {2:6.1f}s  rebuilt {3}/{4}'.format(
+				name, build, render, len(rendered), outputs
+			))
+
+	#Timing Summary
+	total = time.perf_counter() - start
+	rebuilt = sum(x[3] for x in timings)
+	print('{0} authorities, {1} layers each, {2:.1f}s wall, {3:.1f}s mean per authority'.format(
+		len(timings), len(coa_options), total,
+		sum(build + render for name, build, render, count, outputs in timings) / max(len(timings), 1)
+	))
+	print('{0} files rebuilt, {1} reused'.format(rebuilt, sum(x[4] for x in timings) - rebuilt))
+
+if __name__ == '__main__':
+	main()
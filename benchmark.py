@@ -0,0 +1,411 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection
+import cartopy.crs
+import geopandas as gpd
+from shapely.geometry import Polygon, box
+from map_config import lod_tolerances, cull_margin
+from map_data import lnglat_bounds, to_aspect, load_classifications, peak_rss
+from map_render import (
+	coa_options, get_title, text_rc, layer_colors, legend_labels, legend_colors, geom_paths,
+	draw_label, draw_legend, draw_table, draw_scalebar, lod_pyramid, place_labels, table_widths,
+	init_worker, render_layer, render_poster, render_atlas
+)
+
+figsize = (12, 9)
+dpi = 95
+
+############################
+#Synthetic Data
+############################
+#Edge-matched grid of jittered polygons in EPSG:3857, near Adur
+def grid_polygons(n, cell, edge_vertices, rng, origin=(-40000, 6580000)):
+	side = int(np.ceil(np.sqrt(n)))
+	steps = np.arange(side + 1) * cell
+	#Lattice corners and wiggly edges shared by neighbouring cells
+	corners = np.stack(np.meshgrid(steps, steps), axis=-1) + rng.uniform(-0.15, 0.15, (side + 1, side + 1, 2)) * cell
+	t = np.linspace(0, 1, edge_vertices + 2)[1:-1, None]
+	wiggle = lambda shape: rng.uniform(-0.05, 0.05, shape + (edge_vertices, 1)) * cell
+	horizontal = wiggle((side + 1, side)) * [0, 1]
+	vertical = wiggle((side + 1, side)) * [1, 0]
+	def edge(p0, p1, offsets): return p0 + t * (p1 - p0) + offsets
+	polygons = []
+	for i in range(n):
+		r, c = divmod(i, side)
+		bottom = edge(corners[r, c], corners[r, c + 1], horizontal[r, c])
+		right = edge(corners[r, c + 1], corners[r + 1, c + 1], vertical[c + 1, r])
+		top = edge(corners[r + 1, c], corners[r + 1, c + 1], horizontal[r + 1, c])[::-1]
+		left = edge(corners[r, c], corners[r + 1, c], vertical[c, r])[::-1]
+		ring = np.concatenate([
+			[corners[r, c]], bottom, [corners[r, c + 1]], right, [corners[r + 1, c + 1]], top, 
+			[corners[r + 1, c]], left
+		])
+		polygons.append(Polygon(ring + origin))
+
+	return polygons
+
+def synthetic_layers(n, seed=0):
+	rng = np.random.default_rng(seed)
+	cell = 200
+	coas = gpd.GeoDataFrame(
+		{option: rng.gamma(2, 10, n).astype(np.float32) for option in coa_options[1:]},
+		geometry=grid_polygons(n, cell, 3, rng), crs=3857
+	)
+	#Roughly 40 COAs per ward
+	n_wards = max(n // 40, 4)
+	ward_cell = cell * np.ceil(np.sqrt(n)) / np.ceil(np.sqrt(n_wards))
+	wards = gpd.GeoDataFrame(
+		{
+			'Ward_ID': ['{0:03d}'.format(i) for i in range(n_wards)],
+			'WardName': ['Ward {0}'.format(i) for i in range(n_wards)]
+		},
+		geometry=grid_polygons(n_wards, ward_cell, 15, rng), crs=3857
+	)
+
+	return wards, coas
+
+############################
+#Stages
+############################
+@contextmanager
+def timed(results, stage):
+	start = time.perf_counter()
+	yield
+	results[stage] = time.perf_counter() - start
+
+#Time each stage of the map pipeline for one data size
+def run_pipeline(n, export_dpi, layers, out_dir):
+	wards, coas = synthetic_layers(n)
+	options = coa_options[1:layers + 1]
+	results = {}
+	matplotlib.rcParams.update(text_rc['mathtext'])
+
+	figure = Figure(figsize=figsize, dpi=dpi)
+	canvas = FigureCanvasAgg(figure)
+	ax = figure.add_axes([0, 0, 1, 1], projection=cartopy.crs.epsg(3857))
+
+	with timed(results, 'to_aspect'):
+		bounds = to_aspect(lnglat_bounds(wards.total_bounds))
+	ax.set_xlim(bounds[0], bounds[2])
+	ax.set_ylim(bounds[1], bounds[3])
+	#Stubbed basemap, no tiles or network
+	ax.imshow(
+		np.full((256, 256, 4), 230, dtype=np.uint8), extent=(bounds[0], bounds[2], bounds[1], bounds[3]),
+		interpolation='bilinear', zorder=0
+	)
+	with timed(results, 'ward_outlines'):
+		ward_collection = PathCollection(
+			geom_paths(wards['geometry']), transform=ax.transData,
+			zorder=2, linewidth=2, edgecolor='black', facecolor='none'
+		)
+		ax.add_collection(ward_collection, autolim=False)
+	with timed(results, 'labels'):
+		label_points = wards.representative_point()
+		label_positions = place_labels(
+			list(wards['Ward_ID']), np.column_stack([label_points.x, label_points.y]),
+			scale=(bounds[2] - bounds[0]) / ax.bbox.width * dpi / 72
+		)
+		for ward_id, (x, y) in zip(wards['Ward_ID'], label_positions): draw_label(ax, ward_id, x, y)
+	with timed(results, 'coa_geometry'):
+		coa_collection = PathCollection(
+			geom_paths(coas['geometry']), transform=ax.transData,
+			zorder=1, alpha=0.7, edgecolor='lightgray', facecolor='none'
+		)
+		ax.add_collection(coa_collection, autolim=False)
+	with timed(results, 'classify'):
+		classifications = load_classifications(
+			coas, options, path=os.path.join(out_dir, 'classification_{0}.pkl'.format(n)),
+			signature=None, scheme='NaturalBreaks', k=5
+		)
+	get_class = lambda option: classifications[(option, 'NaturalBreaks', 5)]
+	colors = {option: layer_colors(get_class(option), option) for option in options}
+
+	#add_coa per indicator
+	results['add_coa'] = {}
+	for option in options:
+		with timed(results['add_coa'], option):
+			coa_collection.set_facecolor(colors[option])
+	with timed(results, 'add_legend'):
+		draw_legend(ax, legend_labels(get_class(options[0]), options[0]), legend_colors(options[0]), get_title(options[0]))
+	with timed(results, 'table'):
+		table_data = wards.loc[:, ['Ward_ID', 'WardName']]
+		col_labels = ['Ward ID', 'Ward Name']
+		draw_table(ax, table_data.values, col_labels, col_widths=table_widths(table_data.values, col_labels))
+		draw_scalebar(ax)
+	with timed(results, 'canvas_draw_first'):
+		canvas.draw()
+	with timed(results, 'canvas_draw'):
+		canvas.draw()
+	with timed(results, 'savefig_single'):
+		figure.savefig(os.path.join(out_dir, 'single.png'), dpi=export_dpi)
+	with timed(results, 'export_all'):
+		for option in options:
+			coa_collection.set_facecolor(colors[option])
+			draw_legend(ax, legend_labels(get_class(option), option), legend_colors(option), get_title(option))
+			figure.savefig(os.path.join(out_dir, '{0}.png'.format(option)), dpi=export_dpi)
+	results['vertices'] = int(sum(len(path.vertices) for path in coa_collection.get_paths()))
+
+	#Vertices and draw time per level of detail tier
+	with timed(results, 'lod_build'):
+		coa_lod = lod_pyramid(coas['geometry'], lod_tolerances)
+		ward_lod = lod_pyramid(wards['geometry'], lod_tolerances)
+	results['lod'] = []
+	for (tolerance, paths, vertices), (_, ward_paths, ward_vertices) in zip(coa_lod, ward_lod):
+		coa_collection.set_paths(paths)
+		ward_collection.set_paths(ward_paths)
+		tier = {'tolerance': tolerance, 'coa_vertices': int(vertices), 'ward_vertices': int(ward_vertices)}
+		with timed(tier, 'canvas_draw'):
+			canvas.draw()
+		results['lod'].append(tier)
+
+	#Zoomed to 1/8 of the extent, all paths against those near the view
+	cx, cy = (bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2
+	width, height = bounds[2] - bounds[0], bounds[3] - bounds[1]
+	ax.set_xlim(cx - width / 16, cx + width / 16)
+	ax.set_ylim(cy - height / 16, cy + height / 16)
+	coa_collection.set_paths(coa_lod[0][1])
+	coa_collection.set_facecolor(colors[options[-1]])
+	ward_collection.set_paths(ward_lod[0][1])
+	culling = {}
+	with timed(culling, 'canvas_draw'):
+		canvas.draw()
+	with timed(culling, 'query'):
+		x0, x1 = ax.get_xlim()
+		y0, y1 = ax.get_ylim()
+		mx, my = (x1 - x0) * cull_margin, (y1 - y0) * cull_margin
+		view = box(x0 - mx, y0 - my, x1 + mx, y1 + my)
+		rows = np.sort(coas.sindex.query(view))
+		coa_collection.set_paths([coa_lod[0][1][i] for i in rows])
+		coa_collection.set_facecolor(colors[options[-1]][rows])
+		ward_collection.set_paths([ward_lod[0][1][i] for i in np.sort(wards.sindex.query(view))])
+		for label in ax.texts:
+			x, y = label.get_position()
+			label.set_visible(view.bounds[0] <= x <= view.bounds[2] and view.bounds[1] <= y <= view.bounds[3])
+	with timed(culling, 'canvas_draw_culled'):
+		canvas.draw()
+	culling['visible'] = int(len(rows))
+	results['culling'] = culling
+	results['peak_rss_mb'] = peak_rss()
+
+	return results
+
+############################
+#Poster Export
+############################
+#Headless figure spec for the synthetic layers, as the batch exporter builds it
+def synthetic_spec(n, out_dir, options=coa_options[1:2]):
+	wards, coas = synthetic_layers(n)
+	classes = load_classifications(
+		coas, options, path=os.path.join(out_dir, 'classification_spec_{0}_{1}.pkl'.format(n, len(options))), 
+		signature=None, scheme='NaturalBreaks', k=5
+	)
+	get_class = lambda option: classes[(option, 'NaturalBreaks', 5)]
+	bounds = to_aspect(lnglat_bounds(wards.total_bounds))
+	label_points = wards.representative_point()
+	table_data = wards.loc[:, ['Ward_ID', 'WardName']]
+	col_labels = ['Ward ID', 'Ward Name']
+	logo = np.zeros((60, 150, 4), dtype=np.uint8)
+	logo[..., 2:] = 255
+
+	return {
+		'rc': text_rc['mathtext'], 'figsize': figsize, 'dpi': dpi,
+		'xlim': (bounds[0], bounds[2]), 'ylim': (bounds[1], bounds[3]),
+		'basemap': (np.full((256, 256, 4), 230, dtype=np.uint8), (bounds[0], bounds[2], bounds[1], bounds[3])),
+		'coa_paths': geom_paths(coas['geometry']), 'ward_paths': geom_paths(wards['geometry']),
+		'labels': [(ward_id, p.x, p.y) for ward_id, p in zip(wards['Ward_ID'], label_points)],
+		'table': {
+			'cell_text': table_data.values.tolist(), 'col_labels': col_labels, 
+			'col_widths': table_widths(table_data.values, col_labels), 'loc': 'lower left', 'visible': True
+		},
+		'scalebar': {'location': 'lower center', 'visible': True},
+		'overlays': [(logo, [0.9, 0.01, 0.088, 0.047])],
+		'colors': {option: layer_colors(get_class(option), option) for option in options},
+		'legends': {option: (legend_labels(get_class(option), option), legend_colors(option)) for option in options},
+		'legend_loc': 'upper left'
+	}
+
+#Run in a fresh process so peak RSS belongs to the poster alone
+def run_poster(n, width, poster_dpi, path):
+	results = {}
+	with timed(results, 'build'):
+		init_worker(synthetic_spec(n, os.path.dirname(path)))
+	results['peak_rss_mb_before'] = peak_rss()
+	with timed(results, 'render'):
+		render_poster(coa_options[1], path, width, poster_dpi)
+	results['peak_rss_mb'] = peak_rss()
+	results['bytes'] = os.path.getsize(path)
+
+	return results
+
+############################
+#Layer Switch
+############################
+#Median switch latency with redraw, the persistent recoloured collection against the removed
+#gplt.choropleth path, which is only timed when geoplot is installed
+def run_switch(n, layers, out_dir):
+	try: 
+		import geoplot
+		import geoplot.crs
+		from cartopy.mpl.feature_artist import FeatureArtist
+	except ImportError: 
+		geoplot = None
+	wards, coas = synthetic_layers(n)
+	options = coa_options[1:layers + 1]
+	classifications = load_classifications(
+		coas, options, path=os.path.join(out_dir, 'classification_switch_{0}.pkl'.format(n)),
+		signature=None, scheme='NaturalBreaks', k=5
+	)
+	get_class = lambda option: classifications[(option, 'NaturalBreaks', 5)]
+	bounds = to_aspect(lnglat_bounds(wards.total_bounds))
+	def new_axes():
+		figure = Figure(figsize=figsize, dpi=dpi)
+		canvas = FigureCanvasAgg(figure)
+		ax = figure.add_axes([0, 0, 1, 1], projection=cartopy.crs.epsg(3857))
+		ax.set_xlim(bounds[0], bounds[2])
+		ax.set_ylim(bounds[1], bounds[3])
+		canvas.draw()
+		return canvas, ax
+	results = {}
+
+	#Built once, recoloured per switch
+	canvas, ax = new_axes()
+	coa_collection = PathCollection(
+		geom_paths(coas['geometry']), transform=ax.transData,
+		zorder=1, alpha=0.7, edgecolor='lightgray', facecolor='none'
+	)
+	ax.add_collection(coa_collection, autolim=False)
+	colors = {option: layer_colors(get_class(option), option) for option in options}
+	times = []
+	for option in options:
+		start = time.perf_counter()
+		coa_collection.set_facecolor(colors[option])
+		canvas.draw()
+		times.append(time.perf_counter() - start)
+	results['recolour'] = float(np.median(times))
+
+	#Removed and re-plotted per switch, every COA reprojected through cartopy
+	if geoplot is not None:
+		canvas, ax = new_axes()
+		coas_lnglat = coas.to_crs(4326)
+		times = []
+		for option in options:
+			start = time.perf_counter()
+			for x in [x for x in ax.get_children() if type(x) == FeatureArtist]: x.remove()
+			geoplot.choropleth(
+				coas_lnglat, ax=ax, projection=geoplot.crs.WebMercator(), hue=option, 
+				zorder=1, alpha=0.7, scheme=get_class(option), cmap=option, legend=False, edgecolor='lightgray'
+			)
+			ax.set_xlim(bounds[0], bounds[2])
+			ax.set_ylim(bounds[1], bounds[3])
+			canvas.draw()
+			times.append(time.perf_counter() - start)
+		results['choropleth'] = float(np.median(times))
+
+	return results
+
+############################
+#Atlas Export
+############################
+#One multi-page PDF against a separate PDF savefig per layer, same figure
+def run_atlas(n, layers, export_dpi, out_dir):
+	options = coa_options[1:layers + 1]
+	results = {}
+	init_worker(synthetic_spec(n, out_dir, options))
+	with timed(results, 'separate'):
+		paths = [render_layer(option, os.path.join(out_dir, 'layer_{0}.pdf'.format(i)), export_dpi) \
+			for i, option in enumerate(options)]
+	results['separate_bytes'] = sum(os.path.getsize(path) for path in paths)
+	with timed(results, 'atlas'):
+		path = render_atlas(options, os.path.join(out_dir, 'atlas.pdf'), export_dpi)
+	results['atlas_bytes'] = os.path.getsize(path)
+
+	return results
+
+############################
+#Comparison
+############################
+def compare(old, new):
+	for size, stages in new['results'].items():
+		if size not in old['results']: continue
+		print('{0} polygons'.format(size))
+		for stage, seconds in stages.items():
+			before = old['results'][size].get(stage)
+			if isinstance(seconds, dict) or not isinstance(before, float): continue
+			print('  {0:<20}{1:9.3f}s {2:9.3f}s  x{3:.2f}'.format(stage, before, seconds, seconds / before))
+
+def git_commit():
+	try:
+		return subprocess.check_output(
+			['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+			stderr=subprocess.DEVNULL
+		).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def main():
+	parser = argparse.ArgumentParser(description='Headless timing of the map rendering pipeline.')
+	parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+	parser.add_argument('--export-dpi', type=int, default=200)
+	parser.add_argument('--layers', type=int, default=len(coa_options) - 1, help='indicators to export')
+	parser.add_argument('--out', default='bench_results.json')
+	parser.add_argument('--compare', help='earlier results JSON to compare against')
+	parser.add_argument('--poster', type=float, nargs=2, metavar=('WIDTH', 'DPI'), help='streamed poster export, inches and dpi')
+	parser.add_argument('--poster-size', type=int, default=10000, help='polygons in the poster')
+	parser.add_argument('--switch', type=int, metavar='SIZE', help='layer switch latency, old choropleth path if geoplot is installed')
+	parser.add_argument('--atlas', type=int, metavar='SIZE', help='multi-page PDF atlas of --layers against separate PDFs')
+	args = parser.parse_args()
+
+	report = {
+		'commit': git_commit(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python': platform.python_version(), 'matplotlib': matplotlib.__version__,
+		'export_dpi': args.export_dpi, 'results': {}
+	}
+	with tempfile.TemporaryDirectory() as out_dir:
+		for n in args.sizes:
+			report['results'][str(n)] = run_pipeline(n, args.export_dpi, args.layers, out_dir)
+			print('{0} polygons done'.format(n))
+		if args.poster:
+			width, poster_dpi = args.poster
+			context = multiprocessing.get_context('spawn')
+			with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+				report['poster'] = executor.submit(
+					run_poster, args.poster_size, width, poster_dpi, os.path.join(out_dir, 'poster.png')
+				).result()
+			report['poster'].update({'width': width, 'dpi': poster_dpi, 'polygons': args.poster_size})
+			print('Poster {0} in at {1} dpi: {2:.1f}s, peak RSS {3} MB'.format(
+				width, poster_dpi, report['poster']['render'], report['poster']['peak_rss_mb']
+			))
+		if args.switch:
+			report['switch'] = run_switch(args.switch, args.layers, out_dir)
+			report['switch'].update({'layers': args.layers, 'polygons': args.switch})
+			print('Layer switch, {0} polygons: recolour {1:.3f}s, choropleth {2}'.format(
+				args.switch, report['switch']['recolour'], 
+				'{0:.3f}s'.format(report['switch']['choropleth']) if 'choropleth' in report['switch'] else 'not timed, no geoplot'
+			))
+		if args.atlas:
+			report['atlas'] = run_atlas(args.atlas, args.layers, args.export_dpi, out_dir)
+			report['atlas'].update({'layers': args.layers, 'polygons': args.atlas})
+			print('Atlas of {0} layers: {1:.1f}s {2:.1f} MB, separate PDFs {3:.1f}s {4:.1f} MB'.format(
+				args.layers, report['atlas']['atlas'], report['atlas']['atlas_bytes'] / 1024**2,
+				report['atlas']['separate'], report['atlas']['separate_bytes'] / 1024**2
+			))
+	with open(args.out, 'w') as f: json.dump(report, f, indent=1)
+
+	if args.compare:
+		with open(args.compare) as f: compare(json.load(f), report)
+
+if __name__ == '__main__':
+	main()
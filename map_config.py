@@ -0,0 +1,42 @@
+import xyzservices.providers as xyz
+
+############################
+#Settings
+############################
+la_name = 'Adur'
+dpi = 95
+export_dpi = 200
+tile_provider = xyz.CartoDB.Voyager #or url template e.g. 'http://localhost:8000/{z}/{x}/{y}.png'
+tile_cache_path = 'tile_cache.sqlite'
+tile_cache_limit = 512 * 1024**2 #bytes on disk
+prefetch_zooms = range(0, 18)
+classification_scheme = 'NaturalBreaks'
+classification_k = 5
+lod_tolerances = [0, 4, 16, 64] #metres per zoom tier, 0 is full detail for export
+cull_margin = 0.25 #fraction of the view drawn beyond each edge
+layer_cache_limit = 256 * 1024**2 #bytes of rendered layers kept for fast switching
+zoom_step = 0.2 #fraction of the extent per mousewheel notch
+data_cache_dir = 'data_cache'
+label_overrides_path = 'label_overrides.json' #dragged ward label positions
+print_usetex = False #LaTeX text for exports, needs a TeX install
+timings_enabled = True #hot path timing hooks, False installs none
+timings_limit = 4096 #timings kept in the ring buffer
+trace_path = 'map_trace.json' #timing dump, .csv for CSV
+export_manifest_path = 'export_manifest.json' #fingerprints of exported layers, unchanged ones are skipped
+poster_width = 46.8 #inches, A0 landscape
+poster_dpi = 1200
+poster_strip_bytes = 64 * 1024**2 #rendered rows held at once, bounds poster export memory
+session_path = 'map_session.json' #layout and view per authority, restored at startup
+session_raster_path = 'map_session_{0}.png' #last rendered view per authority, shown while the map loads
+
+#Data Sources
+geo_path = r'FilePath'
+data_path = r'FilePath'
+pr_data_path = r'FilePath'
+logo_path = r'FilePath'
+arrow_path = r'FilePath'
+export_path = r'FilePath'
+batch_export_path = r'FilePath' #formatted with (authority, layer)
+poster_path = r'FilePath' #formatted with layer, .png or .tif
+atlas_path = r'FilePath' #every layer as one page of a PDF
+batch_atlas_path = r'FilePath' #formatted with authority
@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import numpy as np
+import shapely
+import geopandas as gpd
+import pandas as pd
+import mapclassify as mc
+from collections import Counter
+from functools import lru_cache
+from types import SimpleNamespace
+from pyproj import Transformer
+
+############################
+#Data
+############################
+#Wards and merged COAs, national layers, COAs in display CRS (EPSG:3857)
+def read_layers(geo_path, data_path, pr_data_path, columns):
+	#Wards
+	wards = gpd.read_file(
+		geo_path, 
+		layer='Wards'
+	)
+	#COAs, codes and geometry only
+	coas = gpd.read_file(
+		geo_path, 
+		layer='COAs',
+		columns=['OA11CD']
+	)
+	#Indicator columns only
+	usecols = lambda column: column == 'COACode' or column in columns
+	dtype = dict.fromkeys(columns, np.float32)
+	data = pd.read_csv(data_path, usecols=usecols, dtype=dtype)
+	coas = pd.merge(
+		left=coas, right=data, left_on='OA11CD', right_on='COACode'
+	).drop(columns='COACode')
+	pr_data = pd.read_csv(pr_data_path, usecols=usecols, dtype=dtype)
+	coas = pd.merge(
+		left=coas, right=pr_data, left_on='OA11CD', right_on='COACode'
+	).drop(columns='COACode')
+
+	#Reprojected once from source into display CRS
+	return to_display(wards, 'wards'), compact_coas(to_display(coas, 'coas'), columns)
+
+#Category codes for IDs, float32 indicators
+def compact_coas(coas, columns):
+	return gpd.GeoDataFrame(
+		{
+			'OA11CD': coas['OA11CD'].astype('category'),
+			**{column: coas[column].to_numpy(dtype=np.float32) for column in columns}
+		},
+		geometry=coas.geometry.values, crs=coas.crs
+	)
+
+#Authority wards and the COAs in its view extent, both already in display CRS, with the national
+#classifications cut down to those COAs
+def authority_layers(wards, coas, classes, la_name):
+	wards = wards.loc[wards['LAD11NM'] == la_name].reset_index(drop=True)
+	rows = view_rows(coas, authority_bounds(wards))
+	coas = coas.iloc[rows].reset_index(drop=True)
+	coas['OA11CD'] = coas['OA11CD'].cat.remove_unused_categories()
+
+	return wards, coas, {key: authority_classes(classification, rows) for key, classification in classes.items()}
+
+#National breaks and counts, class indices for the given rows only, y keeps the national minimum the legend starts from
+def authority_classes(classification, rows):
+	return SimpleNamespace(
+		yb=classification.yb[rows], bins=classification.bins, counts=classification.counts, 
+		y=classification.y[[classification.y.argmin()]]
+	)
+
+#Authority view extent, ward bounds padded to the figure aspect
+def authority_bounds(wards):
+	return to_aspect(lnglat_bounds(wards.total_bounds))
+
+#COA row positions within a view extent, the same selection for the GUI and batch exports
+def view_rows(coas, bounds):
+	return np.sort(coas.sindex.query(shapely.box(*bounds), predicate='intersects'))
+
+#Ward row positions per local authority
+def lad_index(wards):
+	return {name: rows for name, rows in wards.groupby('LAD11NM').indices.items()}
+
+############################
+#Projection
+############################
+#Display CRS for every layer and the axes
+display_epsg = 3857
+
+#Reprojections per layer name, each dataset should appear once
+reprojections = Counter()
+
+#One always_xy Transformer per CRS pair, built on first use
+@lru_cache(maxsize=None)
+def transformer(source, target):
+	return Transformer.from_crs(source, target, always_xy=True)
+
+#Whole coordinate arrays in a single call
+def transform_xy(x, y, source, target=display_epsg):
+	return transformer(source, target).transform(np.asarray(x), np.asarray(y))
+
+#Layer into display CRS, every geometry's coordinates in one transform
+def to_display(layer, name):
+	if layer.crs is not None and layer.crs.equals(display_epsg): return layer
+	reprojections[name] += 1
+	geometry = shapely.transform(
+		layer.geometry.values, lambda xy: np.column_stack(transform_xy(xy[:, 0], xy[:, 1], layer.crs))
+	)
+	return layer.set_geometry(gpd.GeoSeries(geometry, index=layer.index, crs=display_epsg))
+
+#Web Mercator bounds to lon/lat
+def lnglat_bounds(bounds):
+	(w, e), (s, n) = transform_xy([bounds[0], bounds[2]], [bounds[1], bounds[3]], display_epsg, 4326)
+	return [w, s, e, n]
+
+#Convert Bounds (lon/lat) to Aspect Ratio extent in Web Mercator
+def to_aspect(total_bounds):
+	#Exsisting Bounds
+	bounds_ = list(total_bounds)
+	bounds = [
+		i - 0.003 if i == bounds_[0] or i == bounds_[1] else i + 0.003 for i in bounds_
+	]
+	(x0, x1), (y0, y1) = transform_xy([bounds[0], bounds[2]], [bounds[1], bounds[3]], 4326)
+	#New Bounds
+	width = x1 - x0
+	height = y1 - y0
+	if width < height:
+		x_lim = height * 1.333
+		y_lim = height
+	elif width > height: 
+		x_lim = width 
+		y_lim = width / 1.333
+		if y_lim < height:
+			x_lim = width * 1.333
+			y_lim = width
+	mid_x = (x0 + x1) / 2
+	mid_y = (y0 + y1) / 2
+
+	return [
+		mid_x - x_lim/2, mid_y - y_lim/2,
+		mid_x + x_lim/2, mid_y + y_lim/2
+	]
+
+############################
+#Columnar Data Cache
+############################
+#Bumped when the cached layers change shape, older caches are rebuilt
+cache_version = 3
+
+#Raised loading a truncated, corrupt or version-incompatible pickle
+pickle_errors = (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, KeyError, TypeError)
+
+def cache_path(cache_dir, la_name, layer):
+	return os.path.join(cache_dir, '{0}.{1}'.format(la_name, layer))
+
+def write_cache(cache_dir, la_name, wards, coas, classes, signature):
+	os.makedirs(cache_dir, exist_ok=True)
+	#Uncompressed Feather so reads can be memory-mapped
+	wards.to_feather(cache_path(cache_dir, la_name, 'wards.feather'), compression='uncompressed')
+	coas.to_feather(cache_path(cache_dir, la_name, 'coas.feather'), compression='uncompressed')
+	with open(cache_path(cache_dir, la_name, 'classes.pkl'), 'wb') as f: pickle.dump(classes, f)
+	with open(cache_path(cache_dir, la_name, 'json'), 'w') as f: json.dump(signature, f)
+
+#Wards, COAs and classifications, None when missing, stale or unreadable
+def read_cache(cache_dir, la_name, signature):
+	path = cache_path(cache_dir, la_name, 'json')
+	if not os.path.exists(path): return None
+	with open(path) as f: 
+		if json.load(f) != signature: return None
+	try:
+		with open(cache_path(cache_dir, la_name, 'classes.pkl'), 'rb') as f: classes = pickle.load(f)
+	except (OSError,) + pickle_errors:
+		return None
+	return tuple(
+		gpd.read_feather(cache_path(cache_dir, la_name, layer), memory_map=True) \
+		for layer in ['wards.feather', 'coas.feather']
+	) + (classes,)
+
+#Written beside each cache by the build step and load_authority alike, a mismatch rebuilds it
+def cache_signature(geo_path, data_path, pr_data_path, columns, scheme, k):
+	return [cache_version, input_signature(geo_path, data_path, pr_data_path), list(columns), scheme, k]
+
+#Classified over every national COA, so GUI and batch exports share breaks, counts and colours
+def national_classifications(coas, columns, cache_dir, signature, scheme, k):
+	os.makedirs(cache_dir, exist_ok=True)
+	return load_classifications(
+		coas, columns, path=os.path.join(cache_dir, 'classification.pkl'), signature=signature, scheme=scheme, k=k
+	)
+
+#Cached layers and classifications, raw sources only read when their mtimes change
+def load_authority(la_name, geo_path, data_path, pr_data_path, cache_dir, columns, scheme, k):
+	signature = cache_signature(geo_path, data_path, pr_data_path, columns, scheme, k)
+	cached = read_cache(cache_dir, la_name, signature)
+	if cached is not None: return cached
+	wards, coas = read_layers(geo_path, data_path, pr_data_path, columns)
+	classes = national_classifications(coas, columns, cache_dir, signature, scheme, k)
+	wards, coas, classes = authority_layers(wards, coas, classes, la_name)
+	write_cache(cache_dir, la_name, wards, coas, classes, signature)
+
+	return wards, coas, classes
+
+############################
+#Classification Cache
+############################
+def input_signature(*paths):
+	return [[path, os.path.getmtime(path), os.path.getsize(path)] for path in paths]
+
+def load_classifications(coas, columns, path, signature, scheme, k):
+	#Class indices line up with the rows of coas, a different row count invalidates them
+	signature = [signature, len(coas)]
+	#Breaks, counts and class indices per (column, scheme, k), computed once, an unreadable file starts afresh
+	classes = {}
+	if os.path.exists(path):
+		try:
+			with open(path, 'rb') as f: cached = pickle.load(f)
+			if cached['signature'] == signature: classes = cached['classes']
+		except pickle_errors:
+			classes = {}
+	missing = [c for c in columns if (c, scheme, k) not in classes]
+	for column in missing:
+		classes[(column, scheme, k)] = getattr(mc, scheme)(coas[column], k=k)
+	if missing:
+		with open(path, 'wb') as f: pickle.dump({'signature': signature, 'classes': classes}, f)
+		
+	return classes
+
+############################
+#Label Overrides
+############################
+#Manually dragged label positions per authority and ward, kept across sessions
+def read_label_overrides(path, la_name):
+	if not os.path.exists(path): return {}
+	with open(path) as f: return json.load(f).get(la_name, {})
+
+def write_label_overrides(path, la_name, overrides):
+	data = {}
+	if os.path.exists(path):
+		with open(path) as f: data = json.load(f)
+	data[la_name] = overrides
+	with open(path, 'w') as f: json.dump(data, f, indent=1)
+
+############################
+#Build Step
+############################
+#Peak resident set size in MB, None without the resource module (Windows)
+def peak_rss():
+	try: import resource
+	except ImportError: return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	#Bytes on macOS, KB elsewhere
+	return round(peak / 1024**2 if sys.platform == 'darwin' else peak / 1024)
+
+def main():
+	from map_config import geo_path, data_path, pr_data_path, data_cache_dir, classification_scheme, classification_k
+	from map_render import coa_options
+
+	parser = argparse.ArgumentParser(description='Write per authority ward and COA caches.')
+	parser.add_argument('authorities', nargs='*', help='LAD11NM names, all authorities if omitted')
+	args = parser.parse_args()
+
+	start = time.perf_counter()
+	wards, coas = read_layers(geo_path, data_path, pr_data_path, coa_options[1:])
+	read = time.perf_counter() - start
+	print('National layers {0:.2f}s, {1:,} COAs, {2:.0f} MB of attributes, peak RSS {3} MB, reprojected {4}'.format(
+		read, len(coas), coas.memory_usage(deep=True).sum() / 1024**2, peak_rss(), dict(reprojections)
+	))
+	signature = cache_signature(
+		geo_path, data_path, pr_data_path, coa_options[1:], classification_scheme, classification_k
+	)
+	classes = national_classifications(
+		coas, coa_options[1:], data_cache_dir, signature, classification_scheme, classification_k
+	)
+	names = args.authorities or sorted(wards['LAD11NM'].unique())
+	for name in names:
+		#Cold start from raw sources vs from cache
+		start = time.perf_counter()
+		la_wards, la_coas, la_classes = authority_layers(wards, coas, classes, name)
+		raw = read + time.perf_counter() - start
+		write_cache(data_cache_dir, name, la_wards, la_coas, la_classes, signature)
+		start = time.perf_counter()
+		read_cache(data_cache_dir, name, signature)
+		cached = time.perf_counter() - start
+		print('{0:<40} raw {1:6.2f}s  cache {2:6.2f}s'.format(name, raw, cached))
+	print('Peak RSS {0} MB'.format(peak_rss()))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,745 @@
+import os
+import json
+import zlib
+import struct
+import hashlib
+import warnings
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+from matplotlib.transforms import Bbox, IdentityTransform
+from matplotlib.image import AxesImage
+from matplotlib.backends.backend_pdf import PdfPages, PdfFile, RendererPdf, GraphicsContextPdf, Op
+from matplotlib.patches import Patch
+import matplotlib.patheffects as pe
+from matplotlib.textpath import TextToPath
+from matplotlib.font_manager import FontProperties
+from functools import lru_cache
+from collections import OrderedDict
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary
+import shapely
+from shapely.geometry.polygon import orient
+import matplotlib.colors as clr
+
+############################
+#Layer Styling
+############################
+#Choropleth Colors 
+def gen_cmap(n, hex1, hex2, hex3, hex4, hex5):
+	return clr.LinearSegmentedColormap.from_list(
+		n, [(0, hex1), (.25, hex2), (.5, hex3), (.75, hex4), (1, hex5)], 
+		N=256
+	)
+
+choro_list = [
+	gen_cmap(n='pcHHSRS', hex1='#ffffdd', hex2='#ffd799', hex3='#f29d52', hex4='#c06e46', hex5='#a66141'), 
+	gen_cmap(n='pcExcessCold', hex1='#f4f2f7', hex2='#ccd4e7', hex3='#97bfdb', hex4='#60aacf', hex5='#4383a7'), 
+	gen_cmap(n='pcHHSRSFalls', hex1='#fff2ec', hex2='#f9c5ca', hex3='#fa8eb8', hex4='#d454a7', hex5='#9b4199'), 
+	gen_cmap(n='pcDisrepair', hex1='#fafafa', hex2='#d9d9d9', hex3='#b0b0b0', hex4='#8a8a8a', hex5='#5c5c5c'), 
+	gen_cmap(n='pcFP10', hex1='#fff3e3', hex2='#fcd8a8', hex3='#fca981', hex4='#eb7865', hex5='#c6403f'), 
+	gen_cmap(n='pcFPLIHC', hex1='#faf5fb', hex2='#d3d6e9', hex3='#e6b1c3', hex4='#e68a97', hex5='#b35273'), 
+	gen_cmap(n='pcLowIncome', hex1='#ffffd9', hex2='#d4edb4', hex3='#9cd69d', hex4='#65ba7e', hex5='#418e6a'), 
+	gen_cmap(n='pcECLI', hex1='#feffd8', hex2='#b8e3c5', hex3='#72cad6', hex4='#61a0c9', hex5='#5e68b0'), 
+	gen_cmap(n='pcEPCFG', hex1='#e1f5f3', hex2='#b7d4cf', hex3='#8eb4ad', hex4='#6f9693', hex5='#4f7a76'), 
+	gen_cmap(n='pcSolidWall', hex1='#ebdff5', hex2='#cfbadb', hex3='#b599c2', hex4='#9b7ca8', hex5='#866194'), 
+	gen_cmap(n='pcInsCavity', hex1='#ebdff5', hex2='#cfbadb', hex3='#b599c2', hex4='#9b7ca8', hex5='#866194'), 
+	gen_cmap(n='pcUninsCavity', hex1='#ebdff5', hex2='#cfbadb', hex3='#b599c2', hex4='#9b7ca8', hex5='#866194'), 
+	gen_cmap(n='pcLInsLT100', hex1='#ffffff', hex2='#fee6e6', hex3='#ffcfcf', hex4='#f9a487', hex5='#ed7a41'), 
+	gen_cmap(n='SimpleCO2', hex1='#fff0e0', hex2='#f6ceb5', hex3='#e8a18b', hex4='#dd7667', hex5='#d44847'), 
+	gen_cmap(n='HeatDemand', hex1='#ffffff', hex2='#fee6e6', hex3='#ffcfcf', hex4='#f9a487', hex5='#ed7a41'), 
+	gen_cmap(n='HeatCost', hex1='#ffd8d9', hex2='#ffb7ab', hex3='#f99482', hex4='#f17261', hex5='#e3413f'), 
+	gen_cmap(n='EnergyDemand', hex1='#ffffd9', hex2='#d4edb4', hex3='#9cd59e', hex4='#65bb7e', hex5='#418e6a'), 
+	gen_cmap(n='EnergyCost', hex1='#e1f5f3', hex2='#b7d4cf', hex3='#8fb4ad', hex4='#6f9693', hex5='#507a76'), 
+	gen_cmap(n='ElectricityDemand', hex1='#ffffff', hex2='#b2cef5', hex3='#57a1e8', hex4='#5772c9', hex5='#4847ad'), 
+	gen_cmap(n='ElectricityCost', hex1='#ffffff', hex2='#b2cef5', hex3='#57a1e8', hex4='#5772c9', hex5='#4847ad'), 
+	gen_cmap(n='SimpleSAP', hex1='#418f81', hex2='#53acb2', hex3='#8cbddb', hex4='#ccd4e7', hex5='#faf5fb'), 
+	gen_cmap(n='pcPrivateRentedModel', hex1='#ffffff', hex2='#f5e6fb', hex3='#ebcaf9', hex4='#e3b4fa', hex5='#d699f8'), 
+	gen_cmap(n='pc2011CensusPR', hex1='#ffffff', hex2='#ffe6f1', hex3='#fccce2', hex4='#fab4d6', hex5='#f699c6')
+]
+
+for cmap in choro_list:
+	matplotlib.cm.register_cmap(cmap=cmap)
+
+#Text Rendering - mathtext on screen, LaTeX opt-in for print exports
+text_rc = {
+	'mathtext': {
+		'text.usetex': False, 'font.family': 'sans-serif', 
+		'font.sans-serif': ['Helvetica', 'Arial', 'DejaVu Sans'], 'mathtext.fontset': 'custom', 
+		'mathtext.rm': 'sans', 'mathtext.it': 'sans:italic', 'mathtext.bf': 'sans:bold', 
+		'mathtext.cal': 'sans'
+	},
+	'usetex': {
+		'text.usetex': True, 
+		'text.latex.preamble': r'''
+\usepackage{mathtools}
+\usepackage{helvet}
+\renewcommand{\familydefault}{\sfdefault}
+'''
+	}
+}
+
+#Bold text for the active text renderer
+def bold(text):
+	if matplotlib.rcParams['text.usetex']: return r"\textbf{{{0}}}".format(text)
+	return r"$\mathbf{{{0}}}$".format(text.replace(' ', r'\ '))
+
+#Legend Title
+def gen_title(ind, **kwargs):
+	if 'unit' in kwargs:
+		str_ = '\n{0}\n{1} and (no. of COAs)'.format(ind, kwargs['unit'])
+	else:
+		str_ = '\n{0}\nPercent and (no. of COAs)'.format(ind) 
+
+	return str_
+
+ldict = {
+	'pcHHSRS': gen_title(ind='HHSRS Cat. 1 Hazards'), 'pcExcessCold': gen_title(ind='HHSRS Excess Cold'), 
+	'pcHHSRSFalls': gen_title(ind='HHSRS Falls Hazards'), 'pcDisrepair': gen_title(ind='Disrepair'), 
+	'pcFP10': gen_title(ind='Fuel Poverty 10%'), 'pcFPLIHC': gen_title(ind='Fuel Poverty LIHC'),
+	'pcLowIncome': gen_title(ind='Low Income Households'), 'pcECLI': gen_title(ind='Excess Cold and Low Income'), 
+	'pcEPCFG': gen_title(ind='EPC Rating F or G'), 'pcSolidWall': gen_title(ind='Solid Walls'), 
+	'pcInsCavity': gen_title(ind='Insulated Cavity Walls'), 'pcUninsCavity': gen_title(ind='Un-Insulated Cavity Walls'), 
+	'pcLInsLT100': gen_title(ind='Loft Insulation less than 100mm'), 'SimpleCO2': gen_title(ind='Average SimpleCO2', unit='Tonnes/year'), 
+	'HeatDemand': gen_title(ind='Average Total Heat Demand', unit='kWh/year'), 'HeatCost': gen_title(ind='Average Total Heat Cost', unit='£/year'), 
+	'EnergyDemand': gen_title(ind='Average Total Energy Demand', unit='kWh/year'), 'EnergyCost': gen_title(ind='Average Total Energy Cost', unit='£/year'), 
+	'ElectricityDemand': gen_title(ind='Average Total Electricity Demand', unit='kWh/year'), 'ElectricityCost': gen_title(ind='Average Total Electricity Cost', unit='£/year'), 
+	'SimpleSAP': gen_title(ind='Average SimpleSAP', unit='Score'), 'pcPrivateRentedModel': gen_title(ind='Private Rented (BRE Model)'), 
+	'pc2011CensusPR': gen_title(ind='Private Rented (Census 2011)')
+}
+get_title = lambda option: bold('Private Rented') + ldict.setdefault(option)
+
+#COA Layer Options
+coa_options = [
+	'--No Layer--', 'pcHHSRS', 'pcExcessCold', 'pcHHSRSFalls', 'pcDisrepair', 'pcFP10', 'pcFPLIHC', 'pcLowIncome', 
+	'pcECLI', 'pcEPCFG', 'pcSolidWall', 'pcInsCavity', 'pcUninsCavity', 'pcLInsLT100', 'SimpleCO2', 'HeatDemand', 
+	'HeatCost', 'EnergyDemand', 'EnergyCost', 'ElectricityDemand', 'ElectricityCost', 'SimpleSAP', 'pcPrivateRentedModel',
+	'pc2011CensusPR' 
+]
+
+#Face colours per polygon from class indices
+def layer_colors(classification, option):
+	cmap = matplotlib.cm.get_cmap(option)
+	return cmap(classification.yb / (len(classification.bins) - 1))
+
+#Legend Labels
+def legend_labels(classification, option):
+	#Decide Format
+	if option == 'SimpleCO2': frmt = '{:.1f}'
+	else: frmt = '{:.0f}'
+
+	legend_labels = []
+	for i, c in enumerate(classification.counts):
+		if i == 0:
+			str_ = "{0} - {1}".format(
+				str(frmt.format(classification.y.min())), str(frmt.format(classification.bins[i]))
+			)
+		else:
+			str_ = "{0} - {1}".format(
+				str(frmt.format(classification.bins[i-1])), str(frmt.format(classification.bins[i]))
+			)
+		str_ += "({0})".format(c)
+		legend_labels.append(str_)
+
+	return legend_labels
+
+#Legend Handle Colours
+def legend_colors(option):
+	cmap = matplotlib.cm.get_cmap(option)
+	return [cmap(0.), cmap(.25), cmap(.5), cmap(.75), cmap(1.)]
+
+############################
+#Shared Plot Elements
+############################
+#Geometry to matplotlib Path, holes kept as interior rings
+def geom_path(geom):
+	polygons = geom.geoms if geom.geom_type == 'MultiPolygon' else [geom]
+	polygons = [orient(polygon) for polygon in polygons]
+	rings = [
+		np.asarray(ring.coords)[:, :2] for polygon in polygons \
+		for ring in [polygon.exterior, *polygon.interiors]
+	]
+	return Path.make_compound_path(*[Path(ring, closed=True) for ring in rings])
+
+#Paths for many geometries as views into one shared coordinate and code buffer
+def geom_paths(geoms):
+	geoms = np.asarray(geoms)
+	#Vectorised ring orientation needs shapely 2.1
+	if not hasattr(shapely, 'orient_polygons'): return [geom_path(geom) for geom in geoms]
+	geom_type, coords, offsets = shapely.to_ragged_array(shapely.orient_polygons(geoms), include_z=False)
+	rings = offsets[0]
+	#First ring of each geometry, through polygon offsets for MultiPolygons
+	starts = rings[offsets[1] if len(offsets) == 2 else offsets[1][offsets[2]]]
+	codes = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+	codes[rings[:-1]] = Path.MOVETO
+	codes[rings[1:] - 1] = Path.CLOSEPOLY
+
+	return [Path(coords[a:b], codes[a:b]) for a, b in zip(starts[:-1], starts[1:])]
+
+#Ward Label
+def draw_label(ax, text, x, y, **kwargs):
+	return ax.text(
+		s=text, x=x, y=y, horizontalalignment='center', fontsize=14,
+		path_effects=[pe.withStroke(linewidth=6, foreground='w')], zorder=3, **kwargs
+	)
+
+#Text size in points, measured once per text, font size and weight
+@lru_cache(maxsize=None)
+def text_extent(text, fontsize, weight='normal'):
+	return TextToPath().get_text_width_height_descent(
+		text, FontProperties(size=fontsize, weight=weight), ismath=False
+	)
+
+#Label Offsets tried in turn, in label widths and heights
+label_offsets = np.array([
+	(0, 0), (0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1)
+])
+
+#Label positions clear of each other, scale in metres per point, fixed positions kept as given
+def place_labels(texts, points, scale, fontsize=14, fixed=None):
+	fixed = fixed or {}
+	positions = np.array(points, dtype=float)
+	placed = np.empty((0, 4))
+	order = list(fixed) + [i for i in range(len(texts)) if i not in fixed]
+	for i in order:
+		#Label box with its white stroke, half the stroke linewidth each side
+		width, height, descent = (np.array(text_extent(str(texts[i]), fontsize)) + [6, 6, 3]) * scale
+		if i in fixed: candidates = np.array([fixed[i]], dtype=float)
+		else: candidates = positions[i] + label_offsets * [width, height]
+		#Centred horizontally, sat on the baseline
+		boxes = np.column_stack([
+			candidates[:, 0] - width / 2, candidates[:, 1] - descent, 
+			candidates[:, 0] + width / 2, candidates[:, 1] - descent + height
+		])
+		overlaps = (
+			(boxes[:, None, 0] < placed[None, :, 2]) & (boxes[:, None, 2] > placed[None, :, 0]) &
+			(boxes[:, None, 1] < placed[None, :, 3]) & (boxes[:, None, 3] > placed[None, :, 1])
+		).sum(axis=1)
+		best = int(np.argmin(overlaps)) #first clear candidate, else least crowded
+		positions[i] = candidates[best]
+		placed = np.vstack([placed, boxes[best]])
+
+	return positions
+
+#Legend from labels and class colours
+def draw_legend(ax, labels, colors, title, loc='upper left'):
+	handles = [Patch(edgecolor='black', facecolor=color) for color in colors]
+	legend = ax.legend(
+		handles=handles, labels=labels, loc=loc, title=title,
+		framealpha=1, facecolor='white', edgecolor='black', fancybox=False, handlelength=1
+	)
+	legend._legend_box.align = 'left' #align text
+
+	return legend
+
+#Attribute Table Column Widths in points, longest text per column plus padding
+def table_widths(cell_text, col_labels, fontsize=8):
+	return [
+		max(
+			[text_extent(str(row[col]), fontsize)[0] for row in cell_text] + 
+			[text_extent(str(label), fontsize, 'bold')[0]]
+		) * 1.08 + 2 for col, label in enumerate(col_labels)
+	]
+
+#Attribute Table - only drawn for export, widths from table_widths
+def draw_table(ax, cell_text, col_labels, col_widths=None, loc='lower left', **kwargs):
+	table = ax.table(
+		cellText=cell_text, zorder=4, cellLoc='left', loc=loc, colLoc='left',
+		colLabels=[bold(x) for x in col_labels], **kwargs
+	)
+	table.auto_set_font_size(False)
+	table.set_fontsize(8)
+	if col_widths is None: 
+		table.auto_set_column_width(col=list(range(len(col_labels))))
+	else:
+		#Points to axes fraction
+		axes_width = ax.get_position().width * ax.figure.get_figwidth() * 72
+		for (row, col), cell in table.get_celld().items(): cell.set_width(col_widths[col] / axes_width)
+	#Adjust Column Padding
+	for cell in table._cells: table._cells[cell].PAD = 0.04
+
+	return table
+
+#Scalebar
+def draw_scalebar(ax, location='lower center'):
+	from matplotlib_scalebar.scalebar import ScaleBar, SI_LENGTH
+	distance_format = lambda value, unit: '{0:.2f}'.format(value)
+	scalebar = ScaleBar(
+		dx=0.001, units='km', dimension=SI_LENGTH, location=location, label='km',
+		label_loc='right', frameon=False, sep=3, length_fraction=0.35, label_formatter=distance_format
+	)
+	ax.add_artist(scalebar)
+
+	return scalebar
+
+############################
+#Level of Detail
+############################
+#Simplified paths per tolerance (m), tolerance 0 is full detail
+def lod_pyramid(geoms, tolerances):
+	geoms = np.asarray(geoms)
+	tiers = []
+	for tolerance in tolerances:
+		if tolerance == 0: simple = geoms
+		#Coverage simplification keeps shared borders gap-free, needs shapely 2.1
+		elif hasattr(shapely, 'coverage_simplify'): simple = shapely.coverage_simplify(geoms, tolerance)
+		else: simple = shapely.simplify(geoms, tolerance, preserve_topology=True)
+		paths = geom_paths(simple)
+		tiers.append((tolerance, paths, sum(len(path.vertices) for path in paths)))
+
+	return tiers
+
+#Coarsest tier simplified below one pixel
+def lod_tier(tolerances, pixel_size):
+	return max(i for i, tolerance in enumerate(tolerances) if tolerance <= pixel_size)
+
+############################
+#Layer Raster Cache
+############################
+#Offscreen axes matching a view, size in pixels, artists added by add(ax)
+def view_raster(size, dpi, xlim, ylim, add):
+	width, height = size
+	figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+	canvas = FigureCanvasAgg(figure)
+	figure.patch.set_alpha(0)
+	ax = figure.add_axes([0, 0, 1, 1])
+	ax.set_axis_off()
+	add(ax)
+	ax.set_xlim(xlim)
+	ax.set_ylim(ylim)
+	canvas.draw()
+
+	return np.asarray(canvas.buffer_rgba()).copy()
+
+#COA polygons alone as an RGBA array
+def layer_raster(paths, colors, size, dpi, xlim, ylim, **kwargs):
+	return view_raster(size, dpi, xlim, ylim, lambda ax: ax.add_collection(
+		PathCollection(paths, transform=ax.transData, facecolor=colors, **kwargs), autolim=False
+	))
+
+#Layer over base, both RGBA on the same pixel grid
+def composite(base, layer):
+	top = layer[..., 3:].astype(np.float32) / 255
+	bottom = base[..., 3:].astype(np.float32) / 255 * (1 - top)
+	alpha = top + bottom
+	rgb = (layer[..., :3] * top + base[..., :3] * bottom) / np.maximum(alpha, 1e-6)
+	return np.concatenate([rgb, alpha * 255], axis=-1).round().astype(np.uint8)
+
+#Rendered layers for one view, least recently used dropped past limit bytes
+class LayerCache:
+
+	def __init__(self, limit):
+		self.limit = limit
+		self.layers = OrderedDict()
+		self.size = 0
+		self.view = None
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, option, view):
+		#Extent or dpi changed, every raster is stale
+		if view != self.view:
+			self.clear()
+			self.view = view
+		if option not in self.layers:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.layers.move_to_end(option)
+		return self.layers[option]
+
+	def put(self, option, image):
+		if option in self.layers: self.size -= self.layers.pop(option).nbytes
+		self.layers[option] = image
+		self.size += image.nbytes
+		while self.size > self.limit and len(self.layers) > 1:
+			self.size -= self.layers.popitem(last=False)[1].nbytes
+
+	def clear(self):
+		self.layers.clear()
+		self.size = 0
+
+	def stats(self):
+		return 'Layer cache: {0} hits, {1} misses, {2} layers ({3:.0f} MB)'.format(
+			self.hits, self.misses, len(self.layers), self.size / 1024**2
+		)
+
+############################
+#Headless Renderer
+############################
+#Static figure from a picklable spec, all coordinates in EPSG:3857
+def build_figure(spec):
+	figure = Figure(figsize=spec['figsize'], dpi=spec['dpi'])
+	FigureCanvasAgg(figure)
+	ax = figure.add_axes([0, 0, 1, 1])
+	ax.set_xticks([])
+	ax.set_yticks([])
+
+	#Basemap
+	image, extent = spec['basemap']
+	shared_imshow(ax, image, extent=extent, interpolation='bilinear', zorder=0)
+	#COAs and Wards
+	coa_collection = SharedPathCollection(
+		spec['coa_paths'], transform=ax.transData, zorder=1, alpha=0.7,
+		edgecolor='lightgray', facecolor='none', visible=False
+	)
+	ax.add_collection(coa_collection, autolim=False)
+	ax.add_collection(SharedPathCollection(
+		spec['ward_paths'], transform=ax.transData, zorder=2, linewidth=2,
+		edgecolor='black', facecolor='none'
+	), autolim=False)
+	#Labels
+	for text, x, y in spec['labels']: draw_label(ax, text, x, y)
+	#Table
+	if spec['table']['visible']:
+		draw_table(
+			ax, spec['table']['cell_text'], spec['table']['col_labels'], 
+			col_widths=spec['table']['col_widths'], loc=spec['table']['loc']
+		)
+	#Scalebar
+	scalebar = draw_scalebar(ax, spec['scalebar']['location'])
+	scalebar.set_visible(spec['scalebar']['visible'])
+	#Logo and Arrow
+	for image, extent in spec['overlays']: draw_overlay(figure, image, extent)
+
+	ax.set_xlim(spec['xlim'])
+	ax.set_ylim(spec['ylim'])
+	ax.set_aspect('equal', adjustable='box')
+
+	return figure, ax, coa_collection
+
+#Logo or Arrow at a figure fraction extent, resampled by Agg at any dpi instead of resized per export
+def draw_overlay(figure, image, extent):
+	overlay = figure.add_axes(extent, zorder=5)
+	shared_imshow(overlay, image, interpolation='antialiased')
+	overlay.set_aspect('auto')
+	overlay.set_axis_off()
+
+	return overlay
+
+#Worker State - one static figure per process
+_worker = None
+
+def init_worker(spec):
+	global _worker
+	with matplotlib.rc_context(spec['rc']):
+		figure, ax, coa_collection = build_figure(spec)
+	_worker = {'spec': spec, 'figure': figure, 'ax': ax, 'coa_collection': coa_collection}
+
+#Layer colors and legend on the worker figure, inside the spec rc context
+def show_layer(option):
+	spec, ax = _worker['spec'], _worker['ax']
+	coa_collection = _worker['coa_collection']
+	legend = ax.get_legend()
+	if legend is not None: legend.remove()
+
+	if option in spec['colors']:
+		coa_collection.set_facecolor(spec['colors'][option])
+		coa_collection.set_visible(True)
+		labels, colors = spec['legends'][option]
+		draw_legend(ax, labels, colors, get_title(option), loc=spec['legend_loc'])
+	else:
+		coa_collection.set_visible(False)
+
+def render_layer(option, path, dpi):
+	with matplotlib.rc_context(_worker['spec']['rc']):
+		show_layer(option)
+		_worker['figure'].savefig(path, dpi=dpi)
+
+	return path
+
+############################
+#Streaming Export
+############################
+#Horizontal difference per row, PNG filter 1 and TIFF predictor 2
+def sub_filter(rows):
+	rows = rows.reshape(len(rows), -1)
+	filtered = rows.copy()
+	filtered[:, 4:] -= rows[:, :-4]
+	return filtered
+
+#RGBA PNG written strip by strip, one zlib stream across the IDAT chunks
+class PNGStream:
+
+	def __init__(self, path, width, height, dpi):
+		self.file = open(path, 'wb')
+		self.compressor = zlib.compressobj(6)
+		self.file.write(b'\x89PNG\r\n\x1a\n')
+		self.chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+		ppm = round(dpi / 0.0254) #pixels per metre
+		self.chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1))
+
+	def chunk(self, kind, data):
+		self.file.write(struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data)))
+
+	def write(self, rows):
+		filtered = sub_filter(rows)
+		data = np.empty((len(filtered), filtered.shape[1] + 1), dtype=np.uint8)
+		data[:, 0] = 1
+		data[:, 1:] = filtered
+		compressed = self.compressor.compress(data)
+		if compressed: self.chunk(b'IDAT', compressed)
+
+	def close(self):
+		self.chunk(b'IDAT', self.compressor.flush())
+		self.chunk(b'IEND', b'')
+		self.file.close()
+
+#RGBA BigTIFF, one deflated strip per write, offsets past 4 GB allowed
+class TIFFStream:
+
+	def __init__(self, path, width, height, dpi):
+		self.file = open(path, 'wb')
+		self.width, self.height, self.dpi = width, height, dpi
+		self.rows = None
+		self.offsets, self.counts = [], []
+		#Header, first IFD offset filled in on close
+		self.file.write(b'II' + struct.pack('<HHHQ', 43, 8, 0, 0))
+
+	def write(self, rows):
+		#Every strip but the last must hold RowsPerStrip rows
+		if self.rows is None: self.rows = len(rows)
+		data = zlib.compress(sub_filter(rows), 6)
+		self.offsets.append(self.file.tell())
+		self.counts.append(len(data))
+		self.file.write(data)
+
+	def close(self):
+		#Tag values over 8 bytes out of line, then the IFD
+		def array(values, code):
+			offset = self.file.tell()
+			self.file.write(struct.pack('<{0}{1}'.format(len(values), code), *values))
+			return offset
+		offsets = array(self.offsets, 'Q') if len(self.offsets) > 1 else self.offsets[0]
+		counts = array(self.counts, 'Q') if len(self.counts) > 1 else self.counts[0]
+		resolution = struct.pack('<II', round(self.dpi * 1000), 1000)
+		#Tag, type (3 SHORT, 4 LONG, 5 RATIONAL, 16 LONG8), count, value or offset
+		tags = [
+			(256, 4, 1, self.width), (257, 4, 1, self.height), (258, 3, 4, struct.pack('<4H', 8, 8, 8, 8)), 
+			(259, 3, 1, 8), (262, 3, 1, 2), (273, 16, len(self.offsets), offsets), (277, 3, 1, 4), 
+			(278, 4, 1, self.rows), (279, 16, len(self.counts), counts), (282, 5, 1, resolution), 
+			(283, 5, 1, resolution), (284, 3, 1, 1), (296, 3, 1, 2), (317, 3, 1, 2), (338, 3, 1, 2)
+		]
+		ifd = self.file.tell()
+		self.file.write(struct.pack('<Q', len(tags)))
+		for tag, kind, count, value in tags:
+			if not isinstance(value, bytes): value = struct.pack('<Q', value)
+			self.file.write(struct.pack('<HHQ', tag, kind, count) + value.ljust(8, b'\0'))
+		self.file.write(struct.pack('<Q', 0))
+		self.file.seek(8)
+		self.file.write(struct.pack('<Q', ifd))
+		self.file.close()
+
+#PNG or TIFF writer by extension
+@contextmanager
+def image_stream(path, width, height, dpi):
+	kind = TIFFStream if os.path.splitext(path)[1].lower() in ('.tif', '.tiff') else PNGStream
+	stream = kind(path, width, height, dpi)
+	try: yield stream
+	finally: stream.close()
+
+#Layer as a print of width inches at dpi, drawn in strips of at most strip_bytes so memory stays bounded
+def render_poster(option, path, width, dpi, strip_bytes=64 * 1024**2):
+	figure = _worker['figure']
+	size, figure_dpi = figure.get_size_inches(), figure.dpi
+	scaled_dpi = dpi * width / size[0]
+	pixels_x, pixels_y = round(size[0] * scaled_dpi), round(size[1] * scaled_dpi)
+	rows = max(1, strip_bytes // (pixels_x * 4))
+	#Axes boxes fixed where the full figure puts them, then shifted under each strip
+	axes = [(x, x.get_position(original=True), x.get_position(), x.get_aspect()) for x in figure.axes]
+	images = [(image, image.get_clip_box(), image.get_visible()) for x in figure.axes for image in x.images]
+	with matplotlib.rc_context(_worker['spec']['rc']), image_stream(path, pixels_x, pixels_y, dpi) as stream:
+		show_layer(option)
+		figure.set_dpi(scaled_dpi)
+		try:
+			for x, original, active, aspect in axes: x.set_aspect('auto')
+			for top in range(0, pixels_y, rows):
+				height = min(rows, pixels_y - top)
+				bottom = pixels_y - top - height
+				figure.set_size_inches(pixels_x / scaled_dpi, height / scaled_dpi)
+				for x, original, active, aspect in axes:
+					x.set_position([
+						active.x0, (active.y0 * pixels_y - bottom) / height, 
+						active.width, active.height * pixels_y / height
+					])
+				#Images resampled for the strip only, not their whole axes
+				for image, clip, visible in images:
+					box = Bbox.intersection(clip or image.axes.bbox, figure.bbox)
+					image.set_clip_box(box)
+					image.set_visible(visible and box is not None and box.width > 0 and box.height > 0)
+				figure.canvas.draw()
+				stream.write(np.asarray(figure.canvas.buffer_rgba()))
+		finally:
+			figure.set_dpi(figure_dpi)
+			figure.set_size_inches(size)
+			for x, original, active, aspect in axes:
+				x.set_position(original)
+				x.set_aspect(aspect, adjustable='box')
+			for image, clip, visible in images:
+				image.set_clip_box(clip)
+				image.set_visible(visible)
+
+	return path
+
+############################
+#Vector Atlas
+############################
+#Form XObjects and images already written to each atlas PDF, reused by later pages
+_shared_xobjects = WeakKeyDictionary()
+
+#Private matplotlib PDF internals the sharing draws through, written against matplotlib 3.7 (checked on 3.7.5)
+_atlas_internals = [
+	(PdfPages, ['_file']), (PdfFile, ['pathCollectionObject', 'output']), 
+	(RendererPdf, ['_iter_collection', 'check_gc']), (GraphicsContextPdf, ['push', 'pop']), 
+	(PathCollection, ['_prepare_points', '_set_gc_clip'])
+]
+
+#Internals missing from the installed matplotlib, atlases then draw every page in full
+@lru_cache(maxsize=None)
+def missing_atlas_internals():
+	return [
+		'{0}.{1}'.format(kind.__name__, name) for kind, names in _atlas_internals for name in names \
+		if not hasattr(kind, name)
+	]
+
+#Atlas PDF behind a renderer, None for rasters and single page PDFs which draw as usual
+def atlas_file(renderer):
+	vector = getattr(renderer, '_renderer', renderer)
+	if isinstance(vector, RendererPdf) and hasattr(vector, 'gc') and vector.file in _shared_xobjects: 
+		return vector.file
+
+#Paths written once per PDF as form XObjects, each page only sets colours and paints them
+class SharedPathCollection(PathCollection):
+
+	def draw(self, renderer):
+		file = atlas_file(renderer)
+		if file is None or not self.get_visible(): return super().draw(renderer)
+		renderer.open_group('shared_paths', self.get_gid())
+		transform, offset_trf, offsets, paths = self._prepare_points()
+		transform = transform.frozen()
+		facecolors, edgecolors = self.get_facecolor(), self.get_edgecolor()
+		filled = len(facecolors) > 0 and facecolors[0, 3] != 0
+		stroked = len(edgecolors) > 0 and edgecolors[0, 3] != 0 and np.max(self._linewidths) > 0
+		padding = np.max(self._linewidths)
+		gc = renderer.new_gc()
+		self._set_gc_clip(gc)
+		gc.set_snap(self.get_snap())
+		#Templates keyed by geometry and paint, not colour
+		templates = _shared_xobjects[file]
+		key = (id(self), id(paths), tuple(transform.to_values()), padding, filled, stroked)
+		if key not in templates:
+			templates[key] = [
+				file.pathCollectionObject(gc, path, transform, padding, filled, stroked) for path in paths
+			]
+		file.output(*renderer.gc.push())
+		for xo, yo, name, gc0, rgbFace in renderer._iter_collection(
+			gc, templates[key], [], IdentityTransform(), facecolors, edgecolors, 
+			self._linewidths, self._linestyles, self._antialiaseds, self._urls, 'screen'
+		):
+			renderer.check_gc(gc0, rgbFace)
+			file.output(name, Op.use_xobject)
+		file.output(*renderer.gc.pop())
+		gc.restore()
+		renderer.close_group('shared_paths')
+		self.stale = False
+
+#Image resampled once per PDF, the same array lets the PDF backend write one image XObject
+class SharedImage(AxesImage):
+
+	def make_image(self, renderer, magnification=1.0, unsampled=False):
+		file = atlas_file(renderer)
+		if file is None: return super().make_image(renderer, magnification, unsampled)
+		images = _shared_xobjects[file]
+		key = (
+			id(self), id(self._A), magnification, unsampled, tuple(self.get_extent()), 
+			tuple(self.axes.bbox.bounds)
+		)
+		if key not in images: images[key] = super().make_image(renderer, magnification, unsampled)
+		return images[key]
+
+#ax.imshow drawing a SharedImage
+def shared_imshow(ax, data, extent=None, **kwargs):
+	image = SharedImage(ax, **kwargs)
+	image.set_data(data)
+	image.set_clip_path(ax.patch)
+	image.set_extent(extent if extent is not None else image.get_extent())
+	ax.add_image(image)
+
+	return image
+
+#Every layer as one page of a PDF, geometry and rasters shared between pages
+def render_atlas(options, path, dpi):
+	figure = _worker['figure']
+	missing = missing_atlas_internals()
+	if missing:
+		warnings.warn('matplotlib {0} has no {1}, atlas pages are drawn without shared geometry'.format(
+			matplotlib.__version__, ', '.join(missing)
+		))
+	with matplotlib.rc_context(_worker['spec']['rc']), PdfPages(path) as pdf:
+		if not missing: _shared_xobjects[pdf._file] = {}
+		for option in options:
+			show_layer(option)
+			pdf.savefig(figure, dpi=dpi)
+
+	return path
+
+############################
+#Export Manifest
+############################
+#Nested spec values into a hash, arrays and paths by their bytes
+def update_digest(digest, value):
+	if isinstance(value, Path):
+		update_digest(digest, (value.vertices, value.codes))
+	elif isinstance(value, np.ndarray):
+		digest.update(repr((value.dtype.str, value.shape)).encode())
+		digest.update(np.ascontiguousarray(value))
+	elif isinstance(value, dict):
+		for key in sorted(value, key=str): update_digest(digest, (key, value[key]))
+	elif isinstance(value, (list, tuple)):
+		digest.update(b'[')
+		for x in value: update_digest(digest, x)
+		digest.update(b']')
+	else:
+		digest.update(repr(value).encode())
+
+#Fingerprint per layer - shared figure hashed once, then the layer colors and legend
+def layer_fingerprints(spec, options, dpi):
+	shared = hashlib.sha1()
+	update_digest(shared, (
+		matplotlib.__version__, dpi, {key: x for key, x in spec.items() if key not in ('colors', 'legends')}
+	))
+	fingerprints = {}
+	for option in options:
+		digest = shared.copy()
+		update_digest(digest, (option, spec['colors'].get(option), spec['legends'].get(option)))
+		fingerprints[option] = digest.hexdigest()
+
+	return fingerprints
+
+#One fingerprint for a multi-page atlas, changed whenever a page fingerprint changes
+def atlas_fingerprint(spec, options, dpi):
+	fingerprints = layer_fingerprints(spec, options, dpi)
+	return hashlib.sha1(''.join(fingerprints[option] for option in options).encode()).hexdigest()
+
+#Fingerprints of exported files, an output is reused while its fingerprint and file are unchanged
+class ExportManifest:
+
+	def __init__(self, path):
+		self.path = path
+		self.entries = {}
+		if os.path.exists(path):
+			with open(path) as f: self.entries = json.load(f)
+
+	def current(self, output, fingerprint):
+		entry = self.entries.get(os.path.abspath(output))
+		return entry is not None and entry['fingerprint'] == fingerprint and \
+			os.path.exists(output) and os.path.getmtime(output) == entry['mtime']
+
+	def record(self, output, fingerprint):
+		self.entries[os.path.abspath(output)] = {'fingerprint': fingerprint, 'mtime': os.path.getmtime(output)}
+
+	def save(self):
+		with open(self.path, 'w') as f: json.dump(self.entries, f, indent=1)
@@ -0,0 +1,48 @@
+from collections import defaultdict
+import numpy as np
+from fuzzywuzzy import fuzz
+
+############################
+#Search Index
+############################
+#Padded lower case trigrams
+def trigrams(text):
+	text = '  {0} '.format(str(text).lower())
+	return {text[i:i + 3] for i in range(len(text) - 2)}
+
+#Trigram index over (text, kind, row) entries, fuzz only scores the shortlist
+class SearchIndex:
+
+	def __init__(self, entries):
+		self.entries = list(entries)
+		postings = defaultdict(list)
+		for i, (text, kind, row) in enumerate(self.entries):
+			for gram in trigrams(text): postings[gram].append(i)
+		self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+	def search(self, query, limit=10, shortlist=20):
+		query = query.strip()
+		if not query: return []
+		#Entries sharing the most trigrams with the query, grams common to most entries skipped
+		hits = [self.postings[gram] for gram in trigrams(query) if gram in self.postings]
+		if not hits: return []
+		rare = [x for x in hits if len(x) <= len(self.entries) // 10]
+		if rare: hits = rare
+		counts = np.bincount(np.concatenate(hits), minlength=len(self.entries))
+		candidates = np.argpartition(-counts, min(shortlist, len(counts) - 1))[:shortlist]
+		candidates = candidates[counts[candidates] > 0]
+		#Ties go to prefix matches
+		prefix = query.lower()
+		scored = sorted((
+			(fuzz.WRatio(query, self.entries[i][0]), self.entries[i][0].lower().startswith(prefix), int(i)) \
+			for i in candidates
+		), reverse=True)
+		return [(score, *self.entries[i]) for score, is_prefix, i in scored[:limit]]
+
+#Ward names, ward IDs and COA codes
+def search_entries(wards, coas):
+	for row, (ward_id, name) in enumerate(zip(wards['Ward_ID'], wards['WardName'])):
+		yield str(name), 'ward', row
+		yield str(ward_id), 'ward', row
+	for row, code in enumerate(coas['OA11CD']):
+		yield str(code), 'coa', row
@@ -0,0 +1,24 @@
+import os
+import json
+
+############################
+#Session
+############################
+#Saved sessions by authority, an unreadable file starts afresh rather than blocking startup
+def read_sessions(path):
+	if not os.path.exists(path): return {}
+	try:
+		with open(path) as f: return json.load(f)
+	except ValueError:
+		return {}
+
+#Last layout and view for one authority, None until one is saved
+def read_session(path, la_name):
+	return read_sessions(path).get(la_name)
+
+#Written beside the old file then swapped in, a crash mid save keeps the last session
+def write_session(path, la_name, state):
+	data = read_sessions(path)
+	data[la_name] = state
+	with open(path + '.part', 'w') as f: json.dump(data, f, indent=1)
+	os.replace(path + '.part', path)
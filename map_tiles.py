@@ -0,0 +1,150 @@
+import io
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import mercantile
+import requests
+from PIL import Image
+
+############################
+#Basemap Tiles
+############################
+#Tile URL for provider or url template
+def tile_url(provider, x, y, z):
+	if isinstance(provider, str):
+		return provider.format(x=x, y=y, z=z)
+	return provider.build_url(x=x, y=y, z=z)
+
+def provider_key(provider):
+	if isinstance(provider, str): return provider
+	return provider.name
+
+#Tile Store - in memory LRU over on disk SQLite cache
+class TileStore:
+
+	def __init__(self, path, limit, memory_tiles=256):
+		self.limit = limit
+		self.memory_tiles = memory_tiles
+		self.memory = OrderedDict()
+		self.lock = threading.Lock()
+		self.db = sqlite3.connect(path, check_same_thread=False)
+		self.db.execute(
+			'CREATE TABLE IF NOT EXISTS tiles (provider TEXT, z INTEGER, x INTEGER, y INTEGER, '
+			'data BLOB, size INTEGER, atime REAL, PRIMARY KEY (provider, z, x, y))'
+		)
+		self.db.commit()
+		self.size = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM tiles').fetchone()[0]
+
+	#Memory LRU and SQLite both under the lock, views stitch while prefetch puts on another thread
+	def __contains__(self, key):
+		with self.lock:
+			if key in self.memory: return True
+			row = self.db.execute(
+				'SELECT 1 FROM tiles WHERE provider=? AND z=? AND x=? AND y=?', key
+			).fetchone()
+		return row is not None
+
+	def get(self, key):
+		with self.lock:
+			#Memory
+			if key in self.memory:
+				self.memory.move_to_end(key)
+				return self.memory[key]
+			#Disk
+			row = self.db.execute(
+				'SELECT data FROM tiles WHERE provider=? AND z=? AND x=? AND y=?', key
+			).fetchone()
+			if row is None: return None
+			self.db.execute(
+				'UPDATE tiles SET atime=? WHERE provider=? AND z=? AND x=? AND y=?', 
+				(time.time(), *key)
+			)
+			self.db.commit()
+		#Decoded outside the lock
+		tile = np.asarray(Image.open(io.BytesIO(row[0])).convert('RGBA'))
+		with self.lock:
+			self.memory[key] = tile
+			if len(self.memory) > self.memory_tiles: self.memory.popitem(last=False)
+		return tile
+
+	def put(self, key, data):
+		with self.lock:
+			old = self.db.execute(
+				'SELECT size FROM tiles WHERE provider=? AND z=? AND x=? AND y=?', key
+			).fetchone()
+			if old is not None: self.size -= old[0]
+			self.db.execute(
+				'INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?, ?, ?)', 
+				(*key, sqlite3.Binary(data), len(data), time.time())
+			)
+			self.size += len(data)
+			self.evict()
+			self.db.commit()
+			self.memory.pop(key, None)
+
+	def evict(self):
+		#Drop least recently used tiles until under size limit, caller holds the lock
+		while self.size > self.limit:
+			rows = self.db.execute(
+				'SELECT provider, z, x, y, size FROM tiles ORDER BY atime LIMIT 64'
+			).fetchall()
+			if not rows: break
+			for row in rows:
+				self.db.execute(
+					'DELETE FROM tiles WHERE provider=? AND z=? AND x=? AND y=?', row[:4]
+				)
+				self.size -= row[4]
+				self.memory.pop(tuple(row[:4]), None)
+				if self.size <= self.limit: break
+
+#Seed Cache for all zoom levels over bounds (lon/lat)
+def prefetch_tiles(store, bounds, zooms, provider, progress=None):
+	key = provider_key(provider)
+	tiles = list(mercantile.tiles(*bounds, zooms=list(zooms)))
+	session = requests.Session()
+	fetched = 0
+	for i, tile in enumerate(tiles):
+		if (key, tile.z, tile.x, tile.y) not in store:
+			response = session.get(tile_url(provider, tile.x, tile.y, tile.z), timeout=30)
+			if response.ok:
+				store.put((key, tile.z, tile.x, tile.y), response.content)
+				fetched += 1
+		if progress is not None: progress(i + 1, len(tiles))
+	return fetched, len(tiles)
+
+#Zoom level for extent in Web Mercator (matches contextily's _calculate_zoom)
+def tile_zoom(x0, y0, x1, y1, provider):
+	w, s = mercantile.lnglat(x0, y0)
+	e, n = mercantile.lnglat(x1, y1)
+	zoom_lon = math.ceil(math.log2(360 * 2.0 / (e - w)))
+	zoom_lat = math.ceil(math.log2(360 * 2.0 / (n - s)))
+	zoom = min(zoom_lon, zoom_lat)
+	if not isinstance(provider, str): zoom = min(zoom, provider.get('max_zoom', zoom))
+	return max(zoom, 0)
+
+#Stitch cached tiles for extent, missing tiles left transparent
+def stitch_tiles(store, x0, y0, x1, y1, provider):
+	key = provider_key(provider)
+	zoom = tile_zoom(x0, y0, x1, y1, provider)
+	w, s = mercantile.lnglat(x0, y0)
+	e, n = mercantile.lnglat(x1, y1)
+	tiles = list(mercantile.tiles(w, s, e, n, zooms=zoom))
+	xs = sorted(set(t.x for t in tiles))
+	ys = sorted(set(t.y for t in tiles))
+	images = {(t.x, t.y): store.get((key, t.z, t.x, t.y)) for t in tiles}
+	size = next((im.shape[0] for im in images.values() if im is not None), 256)
+
+	image = np.zeros((len(ys) * size, len(xs) * size, 4), dtype=np.uint8)
+	for (x, y), tile in images.items():
+		if tile is None: continue
+		row = (y - ys[0]) * size
+		col = (x - xs[0]) * size
+		image[row:row + size, col:col + size] = tile
+	upper_left = mercantile.xy_bounds(xs[0], ys[0], zoom)
+	lower_right = mercantile.xy_bounds(xs[-1], ys[-1], zoom)
+	extent = (upper_left.left, lower_right.right, lower_right.bottom, upper_left.top)
+	
+	return image, extent
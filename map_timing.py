@@ -0,0 +1,71 @@
+import csv
+import json
+import math
+import time
+from collections import deque
+from functools import wraps
+
+############################
+#Timings
+############################
+#Ring buffer of (stage, start, seconds), hooks only installed when enabled
+class Timings:
+
+	def __init__(self, limit=4096, enabled=True):
+		self.records = deque(maxlen=limit)
+		self.enabled = enabled
+		self.origin = time.perf_counter()
+
+	#Decorator, the function is returned untouched when disabled so hot paths pay nothing
+	def timed(self, stage):
+		def decorate(func):
+			if not self.enabled: return func
+			@wraps(func)
+			def wrapper(*args, **kwargs):
+				start = time.perf_counter()
+				try: return func(*args, **kwargs)
+				finally: self.records.append((stage, start, time.perf_counter() - start))
+			return wrapper
+		return decorate
+
+	#Last, p95 and count per stage in first seen order, seconds
+	def stats(self):
+		stages = {}
+		for stage, start, seconds in list(self.records):
+			stages.setdefault(stage, []).append(seconds)
+		return {
+			stage: (values[-1], sorted(values)[math.ceil(len(values) * 0.95) - 1], len(values)) \
+			for stage, values in stages.items()
+		}
+
+	#Calls per second over the trailing window, e.g. frames drawn
+	def rate(self, stages, window=1.0):
+		since = time.perf_counter() - window
+		return sum(1 for stage, start, seconds in list(self.records) if stage in stages and start >= since) / window
+
+	def summary(self, fps_stages):
+		lines = ['{0:<16}{1:>8}{2:>8}{3:>6}'.format('stage', 'last ms', 'p95 ms', 'n')]
+		for stage, (last, p95, count) in self.stats().items():
+			lines.append('{0:<16}{1:8.1f}{2:8.1f}{3:6}'.format(stage[:16], last * 1000, p95 * 1000, count))
+		lines.append('draw {0:.0f} fps'.format(self.rate(fps_stages)))
+		return '\n'.join(lines)
+
+	#Trace as CSV or JSON by extension, start in seconds since the buffer was created
+	def dump(self, path):
+		records = [
+			{'stage': stage, 'start': start - self.origin, 'ms': seconds * 1000} \
+			for stage, start, seconds in list(self.records)
+		]
+		if path.lower().endswith('.csv'):
+			with open(path, 'w', newline='') as f:
+				writer = csv.DictWriter(f, fieldnames=['stage', 'start', 'ms'])
+				writer.writeheader()
+				writer.writerows(records)
+		else:
+			summary = {
+				stage: {'last_ms': last * 1000, 'p95_ms': p95 * 1000, 'count': count} \
+				for stage, (last, p95, count) in self.stats().items()
+			}
+			with open(path, 'w') as f: json.dump({'summary': summary, 'records': records}, f, indent=1)
+
+		return len(records)
@@ -0,0 +1,29 @@
+import pickle
+import numpy as np
+import pandas as pd
+from map_data import load_classifications
+
+############################
+#Tests
+############################
+def classify(coas, path):
+	return load_classifications(coas, ['HeatCost'], path=path, signature=['sources'], scheme='Quantiles', k=4)
+
+#Cached class indices are only reused for the same row set
+def test_rows_changed_reclassifies(tmp_path):
+	path = str(tmp_path / 'classification.pkl')
+	coas = pd.DataFrame({'HeatCost': np.arange(40, dtype=np.float32)})
+	assert len(classify(coas, path)[('HeatCost', 'Quantiles', 4)].yb) == 40
+
+	classes = classify(coas.iloc[:20], path)
+	assert len(classes[('HeatCost', 'Quantiles', 4)].yb) == 20
+
+#A truncated or unreadable pickle is rebuilt rather than raised
+def test_unreadable_pickle_rebuilt(tmp_path):
+	path = tmp_path / 'classification.pkl'
+	coas = pd.DataFrame({'HeatCost': np.arange(40, dtype=np.float32)})
+	for content in [b'', b'not a pickle', pickle.dumps(['old', 'format'])]:
+		path.write_bytes(content)
+		classes = classify(coas, str(path))
+		assert len(classes[('HeatCost', 'Quantiles', 4)].yb) == 40
+		with open(path, 'rb') as f: assert pickle.load(f)['classes'].keys() == classes.keys()
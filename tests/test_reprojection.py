@@ -0,0 +1,99 @@
+import sys
+import geopandas as gpd
+import pandas as pd
+from shapely.geometry import box
+import map_config
+import map_data
+from map_data import (
+	load_authority, to_display, reprojections, read_layers, lad_index, authority_bounds, view_rows, cache_signature, 
+	national_classifications
+)
+from map_render import coa_options, layer_colors, legend_labels
+
+############################
+#Fixture
+############################
+#Two authorities of two wards each over a grid of COAs, all in EPSG:4326 as the sources ship
+def write_sources(directory, n=8):
+	wards = gpd.GeoDataFrame(
+		{
+			'LAD11NM': ['Adur', 'Adur', 'Worthing', 'Worthing'],
+			'Ward_ID': ['A1', 'A2', 'W1', 'W2'], 'WardName': ['A 1', 'A 2', 'W 1', 'W 2']
+		},
+		geometry=[box(-0.4 + i * 0.04, 50.8, -0.36 + i * 0.04, 50.84) for i in range(4)], crs=4326
+	)
+	step = 0.16 / n
+	codes, cells = [], []
+	for i in range(n):
+		for j in range(n):
+			codes.append('E{0:02d}{1:02d}'.format(i, j))
+			cells.append(box(-0.4 + i * step, 50.8 + j * step / 4, -0.4 + (i + 1) * step, 50.8 + (j + 1) * step / 4))
+	coas = gpd.GeoDataFrame({'OA11CD': codes}, geometry=cells, crs=4326)
+	geo_path = str(directory / 'layers.gpkg')
+	wards.to_file(geo_path, layer='Wards')
+	coas.to_file(geo_path, layer='COAs')
+	data_path, pr_data_path = str(directory / 'data.csv'), str(directory / 'pr.csv')
+	#Every indicator, private renting from its own file
+	columns = [x for x in coa_options[1:] if x != 'pcPrivateRentedModel']
+	pd.DataFrame({'COACode': codes, **{x: range(len(codes)) for x in columns}}).to_csv(data_path, index=False)
+	pd.DataFrame({'COACode': codes, 'pcPrivateRentedModel': range(len(codes))}).to_csv(pr_data_path, index=False)
+
+	return geo_path, data_path, pr_data_path
+
+############################
+#Tests
+############################
+#Each dataset is reprojected once on a raw read, never on a cache hit or for an already displayable layer
+def test_reprojected_once_per_dataset(tmp_path):
+	sources = write_sources(tmp_path)
+	cache_dir = str(tmp_path / 'cache')
+	columns = ['HeatCost', 'pcPrivateRentedModel']
+	reprojections.clear()
+
+	wards, coas, classes = load_authority('Adur', *sources, cache_dir, columns, 'NaturalBreaks', 5)
+	assert reprojections == {'wards': 1, 'coas': 1}
+	assert wards.crs.equals(map_data.display_epsg) and coas.crs.equals(map_data.display_epsg)
+
+	#Cache hit
+	wards, coas, classes = load_authority('Adur', *sources, cache_dir, columns, 'NaturalBreaks', 5)
+	assert reprojections == {'wards': 1, 'coas': 1}
+
+	#Redraw paths hand the loaded layers back, nothing to reproject
+	for i in range(5):
+		to_display(wards, 'wards')
+		to_display(coas, 'coas')
+	assert reprojections == {'wards': 1, 'coas': 1}
+
+#A cache written by the build step is read back by load_authority without touching the sources
+def test_build_step_cache_is_hit(tmp_path, monkeypatch):
+	sources = write_sources(tmp_path)
+	cache_dir = str(tmp_path / 'cache')
+	for name, value in zip(['geo_path', 'data_path', 'pr_data_path', 'data_cache_dir'], [*sources, cache_dir]):
+		monkeypatch.setattr(map_config, name, value)
+	monkeypatch.setattr(sys, 'argv', ['map_data.py', 'Adur'])
+	map_data.main()
+	reprojections.clear()
+
+	wards, coas, classes = load_authority('Adur', *sources, cache_dir, coa_options[1:], 'NaturalBreaks', 5)
+	assert reprojections == {}
+	assert list(wards['Ward_ID']) == ['A1', 'A2']
+
+#The GUI's cached authority matches what batch_plot draws from the national layers, same COAs and colours
+def test_authority_matches_batch(tmp_path):
+	sources = write_sources(tmp_path)
+	cache_dir = str(tmp_path / 'cache')
+	columns = coa_options[1:]
+	wards, coas, classes = load_authority('Worthing', *sources, cache_dir, columns, 'NaturalBreaks', 5)
+
+	#As batch_plot.authority_spec selects them
+	national_wards, national_coas = read_layers(*sources, columns)
+	national_classes = national_classifications(
+		national_coas, columns, cache_dir, cache_signature(*sources, columns, 'NaturalBreaks', 5), 'NaturalBreaks', 5
+	)
+	la_wards = national_wards.iloc[lad_index(national_wards)['Worthing']]
+	rows = view_rows(national_coas.geometry, authority_bounds(la_wards))
+	assert list(coas['OA11CD']) == list(national_coas['OA11CD'].iloc[rows])
+	for column in columns:
+		key = (column, 'NaturalBreaks', 5)
+		assert (layer_colors(classes[key], column) == layer_colors(national_classes[key], column)[rows]).all()
+		assert legend_labels(classes[key], column) == legend_labels(national_classes[key], column)
@@ -1,680 +1,1261 @@
-import geopandas as gpd
-import pandas as pd
-import cartopy.crs
-import pyproj
-import geoplot as gplt
-import geoplot.crs
-import contextily as ctxt
-from matplotlib import pyplot as plt
-import matplotlib.patheffects as pe
+import time
+startup_time = time.perf_counter()
 import tkinter as tk
-from matplotlib.backends.backend_tkagg import *
-from pyproj import Proj, transform
-import mapclassify as mc
-from matplotlib.patches import Patch
-import matplotlib
-import matplotlib_scalebar
-from matplotlib_scalebar.scalebar import ScaleBar, SI_LENGTH
-from PIL import Image, ImageTk
-import matplotlib.colors as clr
-from fuzzywuzzy import fuzz
-
-la_name = 'Adur'
-dpi = 95
-export_dpi = 200
-
-############################
-#Data
-############################
-#Wards
-wards = gpd.read_file(
-	r'FilePath', 
-	layer='Wards'
+from tkinter import ttk
+from collections import deque
+from contextlib import contextmanager
+import os
+import sys
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from map_config import (
+	la_name, dpi, export_dpi, tile_provider, tile_cache_path, tile_cache_limit, prefetch_zooms, 
+	classification_scheme, classification_k, lod_tolerances, cull_margin, layer_cache_limit, zoom_step, 
+	geo_path, data_path, pr_data_path, logo_path, arrow_path, export_path, data_cache_dir, print_usetex, 
+	label_overrides_path, timings_enabled, timings_limit, trace_path, export_manifest_path, 
+	poster_path, poster_width, poster_dpi, poster_strip_bytes, atlas_path, session_path, session_raster_path
 )
-wards = wards.loc[wards['LAD11NM'] == la_name].to_crs(epsg=4326)
-
-#COAs
-coas = gpd.read_file(
-	r'FilePath', 
-	layer='COAs'
-)
-data = pd.read_csv(r'FilePath')
-coas = pd.merge(
-	left=coas, right=data, left_on='OA11CD', right_on='COACode'
-).to_crs(epsg=4326)
-pr_data = pd.read_csv(r'FilePath')
-coas = pd.merge(
-	left=coas, right=pr_data, left_on='OA11CD', right_on='COACode'
-)
-
-############################
-#Plot
-############################
-figure, ax = plt.subplots(
-	1, 1, figsize=(12, 9), dpi=dpi, 
-	subplot_kw={'projection': cartopy.crs.epsg(3857), 'picker': True}
-)
-plt.tight_layout(pad=0, h_pad=0, w_pad=0)
-
-#Convert Bounds to Aspect Ratio
-def to_aspect():
-	#Exsisting Bounds
-	bounds_ = list(wards.total_bounds)
-	bounds = [
-		i - 0.003 if i == bounds_[0] or i == bounds_[1] else i + 0.003 for i in bounds_
+from map_timing import Timings
+from map_session import read_session, write_session
+
+#GUI - spawned export workers import this module without opening a window
+if __name__ == '__main__':
+	############################
+	#Staged Startup
+	############################
+	#Window and progress first, heavy imports and data load on a background thread
+	root = tk.Tk()
+	window = tk.Toplevel(master=root)
+
+	startup_stages = [
+		'import numpy/matplotlib', 'import cartopy', 'import map modules', 'load data', 
+		'classify layers', 'build geometry', 'build search index', 'read basemap tiles'
 	]
-	x0, y0  = transform(
-		Proj(init='epsg:4326'), Proj(init='epsg:3857'), 
-		bounds[0], bounds[1]
-	)
-	x1, y1 = transform(
-		Proj(init='epsg:4326'), Proj(init='epsg:3857'), 
-		bounds[2], bounds[3]
-	)
-	#New Bounds
-	width = x1 - x0
-	height = y1 - y0
-	if width < height:
-		x_lim = height * 1.333
-		y_lim = height
-	elif width > height: 
-		x_lim = width 
-		y_lim = width / 1.333
-		if y_lim < height:
-			x_lim = width * 1.333
-			y_lim = width
-	mid_x = (x0 + x1) / 2
-	mid_y = (y0 + y1) / 2
-
-	return [
-		mid_x - x_lim/2, mid_y - y_lim/2,
-		mid_x + x_lim/2, mid_y + y_lim/2
-	]
-
-############################
-#Plot Elements
-############################
-#Plot Wards
-gplt.polyplot(
-	wards, ax=ax, projection=geoplot.crs.WebMercator(), zorder=2, linewidth=2, 
-)
-#Reference to ward features
-ward_list = []
-for x in ax.get_children():
-	if type(x) == cartopy.mpl.feature_artist.FeatureArtist:
-		ward_list.append(x)
-
-#Axis Limits 
-bounds = to_aspect()
-ax.set_xlim(left=bounds[0], right=bounds[2])
-ax.set_ylim(bottom=bounds[1], top=bounds[3])
-
-#Basemap
-def add_basemap():
-	ctxt.add_basemap(ax=ax, url=ctxt.providers.CartoDB.Voyager)
-add_basemap()
-
-#New df for Labels
-wards_labels = wards.to_crs(epsg=3857)
-wards_labels['coords'] = wards_labels['geometry'].apply(
-	lambda column: [column.centroid.x, column.centroid.y] 
-)
-#Create Labels and save reference to these labels
-label_list = []
-for index, row in wards_labels.iterrows():
-	label = plt.text(
-		s=row['Ward_ID'], x=row['coords'][0], y=row['coords'][1], horizontalalignment='center', 
-		fontsize=14, path_effects=[pe.withStroke(linewidth=6, foreground='w')], zorder=3, 
-		picker=True
+	startup_status = tk.StringVar(value='Starting...')
+	startup_label = tk.Label(window, textvariable=startup_status, font='Helvetica 9')
+	startup_label.grid(column=0, row=1, padx=40, pady=(40, 5))
+	startup_bar = ttk.Progressbar(window, length=400, maximum=len(startup_stages))
+	startup_bar.grid(column=0, row=2, padx=40, pady=(5, 40))
+	#Last session's view from its cached render, shown until the live map replaces it
+	session = read_session(session_path, la_name)
+	startup_preview = None
+	if session is not None and os.path.exists(session_raster_path.format(la_name)):
+		try: preview_tk = tk.PhotoImage(file=session_raster_path.format(la_name))
+		except tk.TclError: preview_tk = None #Tk without PNG support
+		if preview_tk is not None:
+			startup_preview = tk.Label(window, image=preview_tk)
+			startup_preview.image = preview_tk
+			startup_preview.grid(column=0, row=0)
+	root.update()
+	startup_profile = [('window shown at', time.perf_counter() - startup_time)]
+	startup_stage = None
+	#Hot path timings, see map_timing
+	timings = Timings(limit=timings_limit, enabled=timings_enabled)
+
+	#Startup Profile
+	@contextmanager
+	def profiled(stage):
+		global startup_stage
+		startup_stage = stage
+		start = time.perf_counter()
+		yield
+		startup_profile.append((stage, time.perf_counter() - start))
+
+	def load_startup():
+		global np, plt, FigureCanvasTkAgg, AxesImage, PathCollection, cartopy
+		global load_authority, lnglat_bounds, authority_bounds, reprojections
+		global read_label_overrides, write_label_overrides, place_labels
+		global view_raster, layer_raster, composite, LayerCache, layer_fingerprints, ExportManifest
+		global draw_overlay, render_poster, render_atlas, atlas_fingerprint, image_stream
+		global TileStore, prefetch_tiles, stitch_tiles, box, Point, STRtree
+		global coa_options, get_title, text_rc, layer_colors, legend_labels, legend_colors
+		global draw_label, draw_legend, draw_table, table_widths, draw_scalebar, init_worker, render_layer
+		global lod_tier, wards, coas, classifications, coa_colors, coa_lod, ward_lod, bounds, tile_store
+		global search_index
+
+		with profiled('import numpy/matplotlib'):
+			import numpy as np
+			from matplotlib import pyplot as plt
+			from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+			from matplotlib.image import AxesImage
+			from matplotlib.collections import PathCollection
+		with profiled('import cartopy'):
+			import cartopy.crs
+		with profiled('import map modules'):
+			from shapely import STRtree
+			from shapely.geometry import box, Point
+			from map_data import (
+				load_authority, lnglat_bounds, authority_bounds, reprojections, 
+				read_label_overrides, write_label_overrides
+			)
+			from map_tiles import TileStore, prefetch_tiles, stitch_tiles
+			from map_search import SearchIndex, search_entries
+			from map_render import (
+				coa_options, get_title, text_rc, layer_colors, legend_labels, legend_colors, 
+				draw_label, draw_legend, draw_table, table_widths, draw_scalebar, init_worker, render_layer, 
+				lod_pyramid, lod_tier, place_labels, view_raster, layer_raster, 
+				composite, LayerCache, layer_fingerprints, ExportManifest, draw_overlay, render_poster, render_atlas, 
+				atlas_fingerprint, image_stream
+			)
+		#Wards and view extent COAs in EPSG:3857 with national classifications, from cache unless sources changed
+		with profiled('load data'):
+			wards, coas, classifications = load_authority(
+				la_name, geo_path, data_path, pr_data_path, data_cache_dir, coa_options[1:], 
+				classification_scheme, classification_k
+			)
+		#Colours per layer, national breaks as in batch exports
+		with profiled('classify layers'):
+			coa_colors = {
+				option: layer_colors(classifications[(option, classification_scheme, classification_k)], option) \
+				for option in coa_options[1:]
+			}
+		with profiled('build geometry'):
+			#Simplified tiers per zoom, tier 0 full detail
+			coa_lod = lod_pyramid(coas['geometry'], lod_tolerances)
+			ward_lod = lod_pyramid(wards['geometry'], lod_tolerances)
+			#STRtree spatial indexes for viewport culling
+			coas.sindex, wards.sindex
+			bounds = authority_bounds(wards)
+		#Ward names, ward IDs and COA codes
+		with profiled('build search index'):
+			search_index = SearchIndex(search_entries(wards, coas))
+		#Warm tile memory cache for first view
+		with profiled('read basemap tiles'):
+			tile_store = TileStore(path=tile_cache_path, limit=tile_cache_limit)
+			stitch_tiles(tile_store, *bounds, tile_provider)
+
+	class StartupLoader:
+
+		def __init__(self):
+			self.error = None
+			self.done = tk.BooleanVar(value=False)
+			self.thread = threading.Thread(target=self.run, daemon=True)
+
+		def run(self):
+			try: load_startup()
+			except Exception: self.error = sys.exc_info()
+
+		#Hand results back to the main loop
+		def poll(self):
+			if startup_stage is not None:
+				startup_status.set('{0}...'.format(startup_stage.capitalize()))
+				startup_bar['value'] = startup_stages.index(startup_stage)
+			if self.thread.is_alive(): window.after(50, self.poll)
+			else: self.done.set(True)
+
+		def wait(self):
+			self.thread.start()
+			window.after(50, self.poll)
+			root.wait_variable(self.done)
+			if self.error is not None: raise self.error[1].with_traceback(self.error[2])
+
+	StartupLoader().wait()
+	startup_profile.append(('data loaded at', time.perf_counter() - startup_time))
+	get_class = lambda option: classifications[(option, classification_scheme, classification_k)]
+	startup_label.destroy()
+	startup_bar.destroy()
+
+	############################
+	#Plot
+	############################
+	plt.rcParams.update(text_rc['mathtext']) #bold/sans text without a TeX subprocess
+	figure, ax = plt.subplots(
+		1, 1, figsize=(12, 9), dpi=dpi, 
+		subplot_kw={'projection': cartopy.crs.epsg(3857)}
 	)
-	label_list.append(label)
-
-############################
-#COA Elements
-############################
-#Choropleth Colors 
-def gen_cmap(n, hex1, hex2, hex3, hex4, hex5):
-	return clr.LinearSegmentedColormap.from_list(
-		n, [(0, hex1), (.25, hex2), (.5, hex3), (.75, hex4), (1, hex5)], 
-		N=256
+	plt.tight_layout(pad=0, h_pad=0, w_pad=0)
+
+	############################
+	#Plot Elements
+	############################
+	#Plot Wards
+	ward_collection = PathCollection(
+		ward_lod[0][1], transform=ax.transData, 
+		zorder=2, linewidth=2, edgecolor='black', facecolor='none'
 	)
+	ax.add_collection(ward_collection, autolim=False)
+
+	#Axis Limits - last session's extent, so the first basemap is stitched for the restored view
+	ax.set_xlim(left=bounds[0], right=bounds[2])
+	ax.set_ylim(bottom=bounds[1], top=bounds[3])
+	if session is not None:
+		ax.set_xlim(session['xlim'])
+		ax.set_ylim(session['ylim'])
+
+	#Basemap - read from tile cache only, no network
+	basemap, basemap_raster, basemap_count = None, None, 0
+	@timings.timed('add_basemap')
+	def add_basemap(tiles=None):
+		global basemap, basemap_raster, basemap_count
+		x0, x1 = ax.get_xlim()
+		y0, y1 = ax.get_ylim()
+		#Tiles may already be stitched off the main thread
+		image, extent = tiles if tiles is not None else stitch_tiles(tile_store, x0, y0, x1, y1, tile_provider)
+		if basemap is not None: basemap.remove()
+		basemap = ax.imshow(image, extent=extent, interpolation='bilinear', zorder=0)
+		basemap_raster = None
+		basemap_count += 1
+		#Reset Extent
+		ax.set_xlim(left=x0, right=x1)
+		ax.set_ylim(bottom=y0, top=y1)
+	add_basemap()
 
-choro_list = [
-	gen_cmap(n='pcHHSRS', hex1='#ffffdd', hex2='#ffd799', hex3='#f29d52', hex4='#c06e46', hex5='#a66141'), 
-	gen_cmap(n='pcExcessCold', hex1='#f4f2f7', hex2='#ccd4e7', hex3='#97bfdb', hex4='#60aacf', hex5='#4383a7'), 
-	gen_cmap(n='pcHHSRSFalls', hex1='#fff2ec', hex2='#f9c5ca', hex3='#fa8eb8', hex4='#d454a7', hex5='#9b4199'), 
-	gen_cmap(n='pcDisrepair', hex1='#fafafa', hex2='#d9d9d9', hex3='#b0b0b0', hex4='#8a8a8a', hex5='#5c5c5c'), 
-	gen_cmap(n='pcFP10', hex1='#fff3e3', hex2='#fcd8a8', hex3='#fca981', hex4='#eb7865', hex5='#c6403f'), 
-	gen_cmap(n='pcFPLIHC', hex1='#faf5fb', hex2='#d3d6e9', hex3='#e6b1c3', hex4='#e68a97', hex5='#b35273'), 
-	gen_cmap(n='pcLowIncome', hex1='#ffffd9', hex2='#d4edb4', hex3='#9cd69d', hex4='#65ba7e', hex5='#418e6a'), 
-	gen_cmap(n='pcECLI', hex1='#feffd8', hex2='#b8e3c5', hex3='#72cad6', hex4='#61a0c9', hex5='#5e68b0'), 
-	gen_cmap(n='pcEPCFG', hex1='#e1f5f3', hex2='#b7d4cf', hex3='#8eb4ad', hex4='#6f9693', hex5='#4f7a76'), 
-	gen_cmap(n='pcSolidWall', hex1='#ebdff5', hex2='#cfbadb', hex3='#b599c2', hex4='#9b7ca8', hex5='#866194'), 
-	gen_cmap(n='pcInsCavity', hex1='#ebdff5', hex2='#cfbadb', hex3='#b599c2', hex4='#9b7ca8', hex5='#866194'), 
-	gen_cmap(n='pcUninsCavity', hex1='#ebdff5', hex2='#cfbadb', hex3='#b599c2', hex4='#9b7ca8', hex5='#866194'), 
-	gen_cmap(n='pcLInsLT100', hex1='#ffffff', hex2='#fee6e6', hex3='#ffcfcf', hex4='#f9a487', hex5='#ed7a41'), 
-	gen_cmap(n='SimpleCO2', hex1='#fff0e0', hex2='#f6ceb5', hex3='#e8a18b', hex4='#dd7667', hex5='#d44847'), 
-	gen_cmap(n='HeatDemand', hex1='#ffffff', hex2='#fee6e6', hex3='#ffcfcf', hex4='#f9a487', hex5='#ed7a41'), 
-	gen_cmap(n='HeatCost', hex1='#ffd8d9', hex2='#ffb7ab', hex3='#f99482', hex4='#f17261', hex5='#e3413f'), 
-	gen_cmap(n='EnergyDemand', hex1='#ffffd9', hex2='#d4edb4', hex3='#9cd59e', hex4='#65bb7e', hex5='#418e6a'), 
-	gen_cmap(n='EnergyCost', hex1='#e1f5f3', hex2='#b7d4cf', hex3='#8fb4ad', hex4='#6f9693', hex5='#507a76'), 
-	gen_cmap(n='ElectricityDemand', hex1='#ffffff', hex2='#b2cef5', hex3='#57a1e8', hex4='#5772c9', hex5='#4847ad'), 
-	gen_cmap(n='ElectricityCost', hex1='#ffffff', hex2='#b2cef5', hex3='#57a1e8', hex4='#5772c9', hex5='#4847ad'), 
-	gen_cmap(n='SimpleSAP', hex1='#418f81', hex2='#53acb2', hex3='#8cbddb', hex4='#ccd4e7', hex5='#faf5fb'), 
-	gen_cmap(n='pcPrivateRentedModel', hex1='#ffffff', hex2='#f5e6fb', hex3='#ebcaf9', hex4='#e3b4fa', hex5='#d699f8'), 
-	gen_cmap(n='pc2011CensusPR', hex1='#ffffff', hex2='#ffe6f1', hex3='#fccce2', hex4='#fab4d6', hex5='#f699c6')
-]
-
-for cmap in choro_list:
-	plt.register_cmap(cmap=cmap)
-
-#Legend Title
-def gen_title(ind, **kwargs):
-	if 'unit' in kwargs:
-		str_ =  r"\textbf{{{0}}}".format('Private Rented') + \
-				'\n{0}\n{1} and (no. of COAs)'.format(ind, kwargs['unit'])
-	else:
-		str_ = r"\textbf{{{0}}}".format('Private Rented') + \
-				'\n{0}\nPercent and (no. of COAs)'.format(ind) 
-
-	return str_
-
-ldict = {
-	'pcHHSRS': gen_title(ind='HHSRS Cat. 1 Hazards'), 'pcExcessCold': gen_title(ind='HHSRS Excess Cold'), 
-	'pcHHSRSFalls': gen_title(ind='HHSRS Falls Hazards'), 'pcDisrepair': gen_title(ind='Disrepair'), 
-	'pcFP10': gen_title(ind='Fuel Poverty 10%'), 'pcFPLIHC': gen_title(ind='Fuel Poverty LIHC'),
-	'pcLowIncome': gen_title(ind='Low Income Households'), 'pcECLI': gen_title(ind='Excess Cold and Low Income'), 
-	'pcEPCFG': gen_title(ind='EPC Rating F or G'), 'pcSolidWall': gen_title(ind='Solid Walls'), 
-	'pcInsCavity': gen_title(ind='Insulated Cavity Walls'), 'pcUninsCavity': gen_title(ind='Un-Insulated Cavity Walls'), 
-	'pcLInsLT100': gen_title(ind='Loft Insulation less than 100mm'), 'SimpleCO2': gen_title(ind='Average SimpleCO2', unit='Tonnes/year'), 
-	'HeatDemand': gen_title(ind='Average Total Heat Demand', unit='kWh/year'), 'HeatCost': gen_title(ind='Average Total Heat Cost', unit='£/year'), 
-	'EnergyDemand': gen_title(ind='Average Total Energy Demand', unit='kWh/year'), 'EnergyCost': gen_title(ind='Average Total Energy Cost', unit='£/year'), 
-	'ElectricityDemand': gen_title(ind='Average Total Electricity Demand', unit='kWh/year'), 'ElectricityCost': gen_title(ind='Average Total Electricity Cost', unit='£/year'), 
-	'SimpleSAP': gen_title(ind='Average SimpleSAP', unit='Score'), 'pcPrivateRentedModel': gen_title(ind='Private Rented (BRE Model)'), 
-	'pc2011CensusPR': gen_title(ind='Private Rented (Census 2011)')
-}
-get_title = lambda option: ldict.setdefault(option)
-matplotlib.rc('text', usetex=True) #allows Latex format
-#Latex Text Formatting 
-plt.rcParams['text.latex.preamble'] = r'''
-\usepackage{mathtools}
-\usepackage{helvet}
-\renewcommand{\familydefault}{\sfdefault}
-'''
-
-#COA Layer
-def add_coa(option):
-	#Get Bounds 
-	x0, x1 = ax.get_xlim()
-	y0, y1 = ax.get_ylim()
-
-	#Plot COA
-	gplt.choropleth(
-		coas, ax=ax, projection=geoplot.crs.WebMercator(), hue=option, 
-		zorder=1, alpha=0.7, scheme=mc.NaturalBreaks(coas[option], k=5), 
-		cmap=option, legend=False, edgecolor='lightgray'
+	#Ward Labels - points inside each ward, spread apart for the first view, dragged positions kept
+	label_overrides = read_label_overrides(label_overrides_path, la_name)
+	ward_ids = [str(x) for x in wards['Ward_ID']]
+	label_points = wards.representative_point()
+	label_positions = place_labels(
+		ward_ids, np.column_stack([label_points.x, label_points.y]), 
+		scale=(bounds[2] - bounds[0]) / ax.bbox.width * figure.dpi / 72, 
+		fixed={i: label_overrides[x] for i, x in enumerate(ward_ids) if x in label_overrides}
 	)
-	#Set Extent
-	ax.set_xlim(left=x0, right=x1)
-	ax.set_ylim(bottom=y0, top=y1)
-
-#Legend
-def add_legend(option):
-	#Decide Format
-	if option == 'SimpleCO2': frmt = '{:.1f}'
-	else: frmt = '{:.0f}'
-
-	#Legend Labels
-	classification = mc.NaturalBreaks(coas[option], k=5)
-	legend_labels = []
-	for i, c in enumerate(classification.counts):
-		if i == 0:
-			str_ = "{0} - {1}".format(
-				str(frmt.format(coas[option].min())), str(frmt.format(classification.bins[i]))
-			)
-		else:
-			str_ = "{0} - {1}".format(
-				str(frmt.format(classification.bins[i-1])), str(frmt.format(classification.bins[i]))
-			)
-		str_ += "({0})".format(c)
-		legend_labels.append(str_)
-	#Legend Handles
-	cmap = matplotlib.cm.get_cmap(option)
-	handles = [
-		Patch(edgecolor='black', facecolor=cmap(0.)), 
-		Patch(edgecolor='black', facecolor=cmap(.25)), 
-		Patch(edgecolor='black', facecolor=cmap(.5)), 
-		Patch(edgecolor='black', facecolor=cmap(.75)), 
-		Patch(edgecolor='black', facecolor=cmap(1.))
+	#Create Labels and save reference to these labels
+	label_list = [
+		draw_label(ax, text=ward_id, x=x, y=y) \
+		for ward_id, (x, y) in zip(ward_ids, label_positions)
 	]
 
-	#Create Legend
-	legend = ax.legend(
-		handles=handles, labels=legend_labels, loc='upper left', title=get_title(option), 
-		framealpha=1, facecolor='white', edgecolor='black', fancybox=False, handlelength=1
+	############################
+	#COA Elements
+	############################
+	#COA Geometry as single collection in Web Mercator, built once
+	coa_collection = PathCollection(
+		coa_lod[0][1], transform=ax.transData, zorder=1, alpha=0.7, edgecolor='lightgray', 
+		facecolor='none', visible=False
 	)
-	legend._legend_box.align = 'left' #align text 
-	#Make Draggable
-	legend.set_draggable(True, update='loc')
-
-#COA Operations 
-def coa_operations(option):
-	#Create COA Artists reference 
-	coa_list = [
-		x for x in ax.get_children() if type(x) == cartopy.mpl.feature_artist.FeatureArtist \
-		and x not in ward_list
-	] 
-	#reference to layer
-	global layer_ref 
-	layer_ref = option
-
-	if option == '--No Layer--':
-		legend = [
-			x for x in ax.get_children() if type(x) == matplotlib.legend.Legend
-		][0] #Legend reference 
-		for x in coa_list: x.remove()
-		legend.remove()
-		canvas.draw()
-	else:
-		for x in coa_list: x.remove()
-		add_coa(option)
-		add_legend(option)
+	ax.add_collection(coa_collection, autolim=False)
+
+	#Layer composited onto the basemap as one image, the collection is drawn for export only
+	coa_image = AxesImage(ax, interpolation='nearest', zorder=0, visible=False)
+	coa_image.set_data(np.zeros((1, 1, 4)))
+	ax.add_image(coa_image)
+	layer_cache = LayerCache(limit=layer_cache_limit)
+
+	#Level of Detail and Viewport Culling - only paths near the view, simplified below the pixel size
+	layer_ref = coa_options[0]
+	lod_ref, coa_rows, ward_rows = None, None, None
+	lod_times = {tier: deque(maxlen=50) for tier in range(len(lod_tolerances))}
+
+	#Tier and rows near an extent, safe off the main thread
+	def query_view(xlim, ylim, pixel_size):
+		tier = lod_tier(lod_tolerances, pixel_size)
+		#Visible bbox plus margin
+		x0, x1 = sorted(xlim)
+		y0, y1 = sorted(ylim)
+		mx, my = (x1 - x0) * cull_margin, (y1 - y0) * cull_margin
+		view = box(x0 - mx, y0 - my, x1 + mx, y1 + my)
+		return tier, np.sort(coas.sindex.query(view)), np.sort(wards.sindex.query(view)), view.bounds
+
+	def update_view(pixel_size=None, view=None):
+		global lod_ref, coa_rows, ward_rows
+		if view is None:
+			xlim = ax.get_xlim()
+			if pixel_size is None: pixel_size = abs(xlim[1] - xlim[0]) / ax.bbox.width
+			view = query_view(xlim, ax.get_ylim(), pixel_size)
+		tier, coas_, wards_, (xmin, ymin, xmax, ymax) = view
+		if tier != lod_ref or coa_rows is None or not np.array_equal(coas_, coa_rows):
+			coa_rows = coas_
+			coa_collection.set_paths([coa_lod[tier][1][i] for i in coa_rows])
+			if layer_ref in coa_colors: coa_collection.set_facecolor(coa_colors[layer_ref][coa_rows])
+		if tier != lod_ref or ward_rows is None or not np.array_equal(wards_, ward_rows):
+			ward_rows = wards_
+			ward_collection.set_paths([ward_lod[tier][1][i] for i in ward_rows])
+		lod_ref = tier
+		#Labels by current position, they may have been dragged
+		for label in label_list:
+			x, y = label.get_position()
+			label.set_visible(xmin <= x <= xmax and ymin <= y <= ymax)
+	update_view()
+
+	#Redraw after an extent change, timed per tier
+	@timings.timed('redraw_extent')
+	def redraw_extent(view=None, tiles=None):
+		update_view(view=view)
+		add_basemap(tiles)
+		if coa_image.get_visible(): add_coa(layer_ref)
+		start = time.perf_counter()
 		canvas.draw()
+		lod_times[lod_ref].append(time.perf_counter() - start)
+		lod_label.config(text=lod_stats())
+
+	def lod_stats():
+		tolerance = lod_tolerances[lod_ref]
+		vertices = sum(len(path.vertices) for path in coa_collection.get_paths())
+		times = lod_times[lod_ref]
+		draw = '{0:.0f} ms'.format(sum(times) / len(times) * 1000) if times else '--'
+		return 'LOD {0} ({1} m): {2}/{3} COAs, {4:,} vertices, draw {5}'.format(
+			lod_ref, tolerance, len(coa_rows), len(coas), vertices, draw
+		)
 
-############################
-#Ancilliary Plot Elements
-############################
-#Attribute Table
-table_data = wards.loc[:, ['Ward_ID', 'WardName']]
-table_data = table_data.rename(
-	columns={'Ward_ID': 'Ward ID', 'WardName': 'Ward Name'}
-).sort_values(by='Ward ID', ascending=True)
-
-#Draw Table
-table = ax.table(
-	cellText=table_data.values, zorder=4, cellLoc='left', 
-	loc='lower left', colLoc='left', picker=True,
-	colLabels=[ 
-		r"\textbf{{{0}}}".format(table_data.columns[0]), 
-		r"\textbf{{{0}}}".format(table_data.columns[1])
-	]	
-)
-table.auto_set_font_size(False)
-table.auto_set_column_width(col=list(range(len(table_data.columns))))
-table.set_fontsize(8)
-#Adjust Column Padding
-cells = [key for key in table._cells if key[1] == 1]
-for cell in cells: table._cells[cell].PAD = 0.04
-cells = [key for key in table._cells if key[1] == 0]
-for cell in cells: table._cells[cell].PAD = 0.04
-
-table.set_visible(True) #set default not visible
-
-#Scalebar
-distance_format = lambda value, unit: '{0:.2f}'.format(value)
-scalebar = ScaleBar(
-	dx=0.001, units='km', dimension=SI_LENGTH, location='lower center', label='km', 
-	label_loc='right', frameon=False, sep=3, length_fraction=0.35, label_formatter=distance_format
-)
-#Add Scalebar
-ax.add_artist(scalebar)
-scalebar = [x for x in ax.get_children() \
-			if type(x) == matplotlib_scalebar.scalebar.ScaleBar]
-scalebar[0].set_visible(True) #default not visible
-
-############################
-#Tkinter GUI
-############################
-root = tk.Tk()
-window = tk.Toplevel(master=root)
-
-frame = tk.Frame(master=window, bd=1, background='BLACK')
-frame.grid(column=0, row=0, columnspan=10)
-
-canvas = FigureCanvasTkAgg(figure, master=frame)
-canvas.get_tk_widget().pack()
-
-#COA Layer Options
-tk.Label(window, text='--Layer Options--', font='Helvetica 9 bold').grid(column=0, row=1)
-
-coa_options = [
-	'--No Layer--', 'pcHHSRS', 'pcExcessCold', 'pcHHSRSFalls', 'pcDisrepair', 'pcFP10', 'pcFPLIHC', 'pcLowIncome', 
-	'pcECLI', 'pcEPCFG', 'pcSolidWall', 'pcInsCavity', 'pcUninsCavity', 'pcLInsLT100', 'SimpleCO2', 'HeatDemand', 
-	'HeatCost', 'EnergyDemand', 'EnergyCost', 'ElectricityDemand', 'ElectricityCost', 'SimpleSAP', 'pcPrivateRentedModel',
-	'pc2011CensusPR' 
-]
-coa_init = tk.StringVar()
-coa_init.set(coa_options[0])
-coa_dropdown = tk.OptionMenu(window, coa_init, *coa_options, command=coa_operations)
-coa_dropdown.grid(column=0, row=2)
-
-############################
-#TK Imagery
-############################
-def tk_image(url, width_, *args):
-	#Resize image whilst preserving aspect
-	image = Image.open(url)
-	width, height = image.size
-	new_width = width_ 
-	new_height = round((height / width) * new_width)
-	image = image.resize((new_width, new_height))
-
-	#For RGBA Images
-	if 'alpha' in args: image = image.convert('RGBA')
-
-	#Return PIL and TK Image Objects
-	return ImageTk.PhotoImage(image), image
-
-#Images 
-logo_tk, logo_pil = tk_image(url=r'FilePath', width_=100)
-arrow_tk, arrow_pil = tk_image(r'FilePath', 65, 'alpha')
-
-#Labels
-logo_label = tk.Label(master=frame, image=logo_tk)
-logo_label.image = logo_tk
-logo_label.place(x=0, y=0)
-arrow_label = tk.Label(master=frame, image=arrow_tk, bg='white')
-arrow_label.image = arrow_tk
-arrow_label.place(x=0, y=0)
-
-#Update Label Positioning 
-root.update()
-logo_label.place(
-	x = frame.winfo_width() - logo_label.winfo_width() - 5, 
-	y = frame.winfo_height() - logo_label.winfo_height() - 5
-)
-arrow_label.place(
-	x = frame.winfo_width() - arrow_label.winfo_width() - 5, 
-	y = 5 
-)
-root.update()
-
-#Make Images Draggable
-def im_drag_start(event):
-	widget = event.widget
-	widget.drag_start_x = event.x
-	widget.drag_start_y = event.y
-
-def im_drag_motion(event):
-	widget = event.widget
-	x = widget.winfo_x() - widget.drag_start_x + event.x
-	y = widget.winfo_y() - widget.drag_start_y + event.y
-	widget.place(x=x, y=y)
-
-logo_label.bind("<Button-1>", im_drag_start)
-logo_label.bind("<B1-Motion>", im_drag_motion)
-
-arrow_label.bind("<Button-1>", im_drag_start)
-arrow_label.bind("<B1-Motion>", im_drag_motion)
-
-############################
-#Matplotlib Functionality
-############################
-#Artist Visibility
-class PltToggle:
-
-	def __init__(self, artist, init):
-		self.artist = artist 
-		self.init = init
-
-	def visibility_toggle(self):
-		if self.init.get() == 'on':
-			self.artist.set_visible(True)
+	#COA Layer - cached composite with the basemap for this view, polygons only rasterised on a miss
+	@timings.timed('add_coa')
+	def add_coa(option):
+		global basemap_raster
+		coa_collection.set_facecolor(coa_colors[option][coa_rows])
+		xlim, ylim = ax.get_xlim(), ax.get_ylim()
+		view = (xlim, ylim, figure.dpi, tuple(ax.bbox.bounds), lod_ref, basemap_count)
+		image = layer_cache.get(option, view)
+		if image is None:
+			x0, y0, width, height = ax.bbox.bounds
+			size = (round(width), round(height))
+			#Basemap resampled to the axes pixels once per view
+			if basemap_raster is None or basemap_raster.shape[:2] != (size[1], size[0]):
+				tiles, extent = basemap.get_array(), basemap.get_extent()
+				basemap_raster = view_raster(size, figure.dpi, xlim, ylim, lambda ax_: ax_.imshow(
+					tiles, extent=extent, interpolation='bilinear'
+				))
+			image = composite(basemap_raster, layer_raster(
+				coa_collection.get_paths(), coa_colors[option][coa_rows], size, figure.dpi, xlim, ylim, 
+				alpha=0.7, edgecolor='lightgray'
+			))
+			layer_cache.put(option, image)
+		coa_image.set_data(image)
+		coa_image.set_extent((xlim[0], xlim[1], ylim[0], ylim[1]))
+		coa_image.set_visible(True)
+		basemap.set_visible(False)
+
+	#Legend
+	@timings.timed('add_legend')
+	def add_legend(option):
+		legend = draw_legend(
+			ax, labels=legend_labels(get_class(option), option), colors=legend_colors(option), 
+			title=get_title(option)
+		)
+		#Make Draggable
+		legend.set_draggable(True, update='loc')
+
+	#COA Operations 
+	@timings.timed('coa_operations')
+	def coa_operations(option):
+		start = time.perf_counter()
+		#reference to layer
+		global layer_ref 
+		layer_ref = option
+
+		if option == '--No Layer--':
+			coa_image.set_visible(False)
+			basemap.set_visible(True)
+			legend = ax.get_legend()
+			if legend is not None: legend.remove()
 			canvas.draw()
-		elif self.init.get() == 'off':
-			self.artist.set_visible(False)
+		else:
+			add_coa(option)
+			add_legend(option)
 			canvas.draw()
-
-table_status = tk.StringVar()
-table_visibility = PltToggle(artist=table, init=table_status)
-table_toggle = tk.Checkbutton(
-	window, text='Attribute Table', variable=table_status, onvalue='on',
-	offvalue='off', command=table_visibility.visibility_toggle
-)
-table_toggle.select()
-table_toggle.grid(column=1, row=2)
-
-sb_status = tk.StringVar()
-sb_visibility = PltToggle(artist=scalebar[0], init=sb_status)
-sb_toggle = tk.Checkbutton(
-	window, text='Scalebar', variable=sb_status, onvalue='on',
-	offvalue='off', command=sb_visibility.visibility_toggle	
-)
-sb_toggle.select()
-sb_toggle.grid(column=1, row=3)
-
-tk.Label(window, text='--Ancilliary Elements--', font='Helvetica 9 bold').grid(row=1, column=1)
-
-#Make Labels Draggable
-class DraggableLabel:
-
-	def __init__(self, label):
-		self.label = label
-		self.txt_press = None
-		self.txt_drag_init()
-
-	def txt_drag_press(self, event):
-		if event.artist != self.label: return
-		if event.mouseevent.button == 1:
-			x0, y0 = self.label.get_position()
-			self.txt_press = event.mouseevent.x, event.mouseevent.y, x0, y0
-
-	def txt_drag_motion(self, event):
-		if self.txt_press != None:
-			mouse_x, mouse_y, x0, y0 = self.txt_press
+		switch_label.config(
+			text='Layer switch: {0:.0f} ms'.format((time.perf_counter() - start) * 1000)
+		)
+		cache_label.config(text=layer_cache.stats())
+
+	############################
+	#Ancilliary Plot Elements
+	############################
+	#Attribute Table - shown in a Tk tree, drawn into the figure only for export
+	table_data = wards.loc[:, ['Ward_ID', 'WardName']]
+	table_data = table_data.rename(
+		columns={'Ward_ID': 'Ward ID', 'WardName': 'Ward Name'}
+	).sort_values(by='Ward ID', ascending=True)
+	table_col_widths = table_widths(table_data.values, table_data.columns) #points, measured once
+
+	#Scalebar
+	scalebar = [draw_scalebar(ax, location='lower center')]
+	scalebar[0].set_visible(True) #default not visible
+
+	############################
+	#Tkinter GUI
+	############################
+	frame = tk.Frame(master=window, bd=1, background='BLACK')
+	frame.grid(column=0, row=0, columnspan=10)
+	#Cached view kept on top until the session is restored
+	if startup_preview is not None: startup_preview.lift()
+
+	canvas = FigureCanvasTkAgg(figure, master=frame)
+	canvas.draw = timings.timed('canvas.draw')(canvas.draw)
+	canvas.get_tk_widget().pack()
+
+	#COA Layer Options
+	tk.Label(window, text='--Layer Options--', font='Helvetica 9 bold').grid(column=0, row=1)
+
+	coa_init = tk.StringVar()
+	coa_init.set(coa_options[0])
+	coa_dropdown = tk.OptionMenu(window, coa_init, *coa_options, command=coa_operations)
+	coa_dropdown.grid(column=0, row=2)
+	switch_label = tk.Label(window, text='Layer switch: -- ms', font='Helvetica 8')
+	switch_label.grid(column=0, row=3)
+	cache_label = tk.Label(window, text=layer_cache.stats(), font='Helvetica 8')
+	cache_label.grid(column=0, row=4)
+
+	#Attribute Table - Tk only draws the rows in view
+	table_frame = tk.Frame(master=window)
+	table_frame.grid(column=10, row=0, sticky='ns')
+
+	#Ward Search - names, IDs and COA codes, picking a result zooms to it
+	search_text = tk.StringVar()
+	tk.Label(table_frame, text='Search Wards/COAs', font='Helvetica 8').pack(anchor='w')
+	tk.Entry(table_frame, textvariable=search_text).pack(fill='x')
+	search_list = tk.Listbox(table_frame, height=6, font='Helvetica 8')
+	search_list.pack(fill='x')
+	search_label = tk.Label(table_frame, text='', font='Helvetica 8')
+	search_label.pack(anchor='w')
+
+	class WardSearch:
+
+		def __init__(self):
+			self.results = []
+
+		def update(self, *args):
+			start = time.perf_counter()
+			self.results, seen = [], set()
+			#Name and ID of one ward may both match
+			for score, text, kind, row in search_index.search(search_text.get()):
+				if (kind, row) in seen: continue
+				seen.add((kind, row))
+				self.results.append((kind, row))
+			search_list.delete(0, 'end')
+			for kind, row in self.results:
+				if kind == 'ward': 
+					search_list.insert('end', '{0} {1}'.format(wards['Ward_ID'].iloc[row], wards['WardName'].iloc[row]))
+				else: 
+					search_list.insert('end', '{0} (COA)'.format(coas['OA11CD'].iloc[row]))
+			search_label.config(text='{0} results in {1:.1f} ms'.format(
+				len(self.results), (time.perf_counter() - start) * 1000
+			))
+
+		def pick(self, event):
+			selection = search_list.curselection()
+			if not selection: return
+			kind, row = self.results[selection[0]]
+			zoom_to((wards if kind == 'ward' else coas)['geometry'].iloc[row])
+
+	ward_search = WardSearch()
+	search_text.trace_add('write', ward_search.update)
+	search_list.bind('<<ListboxSelect>>', ward_search.pick)
+	table_filter = tk.StringVar()
+	tk.Label(table_frame, text='Filter Wards', font='Helvetica 8').pack(anchor='w')
+	tk.Entry(table_frame, textvariable=table_filter).pack(fill='x')
+	table_tree = ttk.Treeview(table_frame, columns=list(table_data.columns), show='headings')
+	table_scroll = ttk.Scrollbar(table_frame, orient='vertical', command=table_tree.yview)
+	table_tree.configure(yscrollcommand=table_scroll.set)
+	table_scroll.pack(side='right', fill='y')
+	table_tree.pack(side='left', fill='both', expand=True)
+
+	class AttributeTable:
+
+		def __init__(self, tree, data, widths):
+			self.tree = tree
+			self.columns = list(data.columns)
+			self.rows = {tree.insert('', 'end', values=list(row)): list(row) for row in data.values}
+			self.order = list(self.rows)
+			self.sort_col, self.descending = None, False
+			for col, width in zip(self.columns, widths):
+				tree.heading(col, text=col, command=lambda col=col: self.sort(col))
+				tree.column(col, width=round(width * 4 / 3), stretch=False) #points to pixels
+
+		#Heading click, repeat to reverse
+		def sort(self, col):
+			self.descending = col == self.sort_col and not self.descending
+			self.sort_col = col
+			i = self.columns.index(col)
+			self.order.sort(key=lambda item: self.rows[item][i], reverse=self.descending)
+			self.filter()
+
+		#Rows containing the filter text in any column, in sort order
+		def filter(self, *args):
+			text = table_filter.get().strip().lower()
+			shown = [
+				item for item in self.order if not text or any(text in str(x).lower() for x in self.rows[item])
+			]
+			self.tree.detach(*self.tree.get_children())
+			for index, item in enumerate(shown): self.tree.move(item, '', index)
+
+		#Shown rows for export
+		def cell_text(self):
+			return [self.rows[item] for item in self.tree.get_children()]
+
+	attribute_table = AttributeTable(table_tree, table_data, table_col_widths)
+	table_filter.trace_add('write', attribute_table.filter)
+
+	############################
+	#TK Imagery
+	############################
+	def tk_image(url, width_, *args):
+		from PIL import Image, ImageTk
+		#Resize image whilst preserving aspect
+		image = Image.open(url)
+		width, height = image.size
+		new_width = width_ 
+		new_height = round((height / width) * new_width)
+		image = image.resize((new_width, new_height))
+
+		#For RGBA Images
+		if 'alpha' in args: image = image.convert('RGBA')
+
+		#Return PIL and TK Image Objects
+		return ImageTk.PhotoImage(image), image
+
+	#Full resolution RGBA for exports, Agg resamples it to the placed size at any dpi
+	def source_image(url):
+		from PIL import Image
+		return np.asarray(Image.open(url).convert('RGBA'))
+
+	#Images 
+	logo_tk, logo_pil = tk_image(url=logo_path, width_=100)
+	arrow_tk, arrow_pil = tk_image(arrow_path, 65, 'alpha')
+	logo_source, arrow_source = source_image(logo_path), source_image(arrow_path)
+
+	#Labels
+	logo_label = tk.Label(master=frame, image=logo_tk)
+	logo_label.image = logo_tk
+	logo_label.place(x=0, y=0)
+	arrow_label = tk.Label(master=frame, image=arrow_tk, bg='white')
+	arrow_label.image = arrow_tk
+	arrow_label.place(x=0, y=0)
+
+	#Update Label Positioning 
+	root.update()
+	logo_label.place(
+		x = frame.winfo_width() - logo_label.winfo_width() - 5, 
+		y = frame.winfo_height() - logo_label.winfo_height() - 5
+	)
+	arrow_label.place(
+		x = frame.winfo_width() - arrow_label.winfo_width() - 5, 
+		y = 5 
+	)
+	root.update()
+
+	#Make Images Draggable
+	def im_drag_start(event):
+		widget = event.widget
+		widget.drag_start_x = event.x
+		widget.drag_start_y = event.y
+
+	def im_drag_motion(event):
+		widget = event.widget
+		x = widget.winfo_x() - widget.drag_start_x + event.x
+		y = widget.winfo_y() - widget.drag_start_y + event.y
+		widget.place(x=x, y=y)
+
+	logo_label.bind("<Button-1>", im_drag_start)
+	logo_label.bind("<B1-Motion>", im_drag_motion)
+
+	arrow_label.bind("<Button-1>", im_drag_start)
+	arrow_label.bind("<B1-Motion>", im_drag_motion)
+
+	############################
+	#Matplotlib Functionality
+	############################
+	#Artist Visibility
+	class PltToggle:
+
+		def __init__(self, artist, init):
+			self.artist = artist 
+			self.init = init
+
+		def visibility_toggle(self):
+			if self.init.get() == 'on':
+				self.artist.set_visible(True)
+				canvas.draw()
+			elif self.init.get() == 'off':
+				self.artist.set_visible(False)
+				canvas.draw()
+
+	#Attribute Table in exports
+	table_status = tk.StringVar()
+	table_toggle = tk.Checkbutton(
+		window, text='Attribute Table', variable=table_status, onvalue='on', offvalue='off'
+	)
+	table_toggle.select()
+	table_toggle.grid(column=1, row=2)
+
+	sb_status = tk.StringVar()
+	sb_visibility = PltToggle(artist=scalebar[0], init=sb_status)
+	sb_toggle = tk.Checkbutton(
+		window, text='Scalebar', variable=sb_status, onvalue='on',
+		offvalue='off', command=sb_visibility.visibility_toggle	
+	)
+	sb_toggle.select()
+	sb_toggle.grid(column=1, row=3)
+
+	tk.Label(window, text='--Ancilliary Elements--', font='Helvetica 9 bold').grid(row=1, column=1)
+
+	#Blitted Interaction
+	class BlitManager:
+
+		def __init__(self, canvas, figure):
+			self.canvas = canvas
+			self.figure = figure
+			self.background = None
+			self.artists = []
+			self.pan_image = None
+			self.frame_times = deque(maxlen=240)
+
+		def active(self):
+			return self.background is not None
+
+		def start(self, *artists):
+			#Cache static background once, moving artists excluded
+			self.artists = [x for x in artists if x is not None]
+			for x in self.artists: x.set_animated(True)
+			self.canvas.draw()
+			self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+			self.frame_times.clear()
+			self.blit()
+
+		def start_pan(self, *overlays):
+			#Snapshot map content as a single image that follows the extent
+			self.start(*overlays)
+			buffer = np.asarray(self.canvas.buffer_rgba())
+			x0, y0, x1, y1 = [int(round(i)) for i in ax.bbox.extents]
+			height = buffer.shape[0]
+			snapshot = buffer[height - y1:height - y0, x0:x1].copy()
+			xlim, ylim = ax.get_xlim(), ax.get_ylim()
+			self.pan_image = AxesImage(
+				ax, origin='upper', extent=(xlim[0], xlim[1], ylim[0], ylim[1]), 
+				interpolation='nearest', animated=True
+			)
+			self.pan_image.set_data(snapshot)
+			self.pan_image.set_clip_path(ax.patch)
+
+		@timings.timed('blit frame')
+		def update(self):
+			if self.background is None: return
+			start = time.perf_counter()
+			self.canvas.restore_region(self.background)
+			self.blit()
+			self.frame_times.append(time.perf_counter() - start)
+
+		def blit(self):
+			if self.pan_image is not None:
+				self.figure.draw_artist(ax.patch)
+				self.figure.draw_artist(self.pan_image)
+			for x in self.artists: self.figure.draw_artist(x)
+			self.canvas.blit(self.figure.bbox)
+
+		def stop(self, redraw=True):
+			for x in self.artists: x.set_animated(False)
+			self.artists = []
+			self.background = None
+			self.pan_image = None
+			fps_label.config(text=self.frame_stats())
+			if redraw: self.canvas.draw()
+
+		def frame_stats(self):
+			#Mean frame time and rate over last drag
+			if not self.frame_times: return 'Drag: -- ms/frame'
+			mean = sum(self.frame_times) / len(self.frame_times)
+			return 'Drag: {0:.1f} ms/frame ({1:.0f} fps)'.format(mean * 1000, 1 / mean)
+
+	blitter = BlitManager(canvas=canvas, figure=figure)
+
+	#Interaction Manager - one set of canvas callbacks, each press routed to a single handler
+	class InteractionManager:
+
+		def __init__(self, canvas):
+			self.canvas = canvas
+			self.layers = []
+			self.fallback = None
+			self.targets = []
+			self.tree = None
+			self.active = None
+			canvas.mpl_connect('draw_event', self.invalidate)
+			canvas.mpl_connect('button_press_event', self.press)
+			canvas.mpl_connect('motion_notify_event', self.motion)
+			canvas.mpl_connect('button_release_event', self.release)
+
+		#Layers added in priority order, handler None leaves the press to matplotlib
+		def add(self, artists, handler):
+			self.layers.append((artists, handler))
+
+		#Window extents move with every full draw
+		def invalidate(self, event=None):
+			self.tree = None
+
+		def index(self):
+			renderer = self.canvas.get_renderer()
+			boxes, self.targets = [], []
+			for priority, (artists, handler) in enumerate(self.layers):
+				for artist in artists():
+					if artist is None or not artist.get_visible(): continue
+					boxes.append(box(*artist.get_window_extent(renderer).extents))
+					self.targets.append((priority, artist, handler))
+			self.tree = STRtree(boxes)
+
+		def hit(self, event):
+			if self.tree is None: self.index()
+			hits = self.tree.query(Point(event.x, event.y), predicate='intersects')
+			if len(hits) == 0: return None
+			return min((self.targets[i] for i in hits), key=lambda target: target[0])
+
+		def press(self, event):
+			if event.button != 1 or self.active is not None: return
+			hit = self.hit(event)
+			if hit is not None: 
+				priority, artist, handler = hit
+				if handler is None: return
+			elif event.inaxes == ax and self.fallback is not None: 
+				artist, handler = ax, self.fallback
+			else: return
+			if handler.press(event, artist): self.active = handler
+
+		def motion(self, event):
+			if self.active is not None: self.active.motion(event)
+
+		def release(self, event):
+			if self.active is None: return
+			handler, self.active = self.active, None
+			handler.release(event)
+
+	#Drag Ward Labels
+	class LabelDrag:
+
+		def press(self, event, label):
+			if blitter.active(): return False
+			self.label = label
+			x0, y0 = label.get_position()
+			self.start = event.x, event.y, x0, y0
+			x_lim = ax.get_xlim()
+			self.scale = (x_lim[1] - x_lim[0]) / ax.bbox.width #metres per pixel
+			blitter.start(label)
+			return True
+
+		@timings.timed('label drag')
+		def motion(self, event):
+			mouse_x, mouse_y, x0, y0 = self.start
 			dx = event.x - mouse_x
 			dy = event.y - mouse_y
-			self.label.set_position((x0 + dx, y0 + dy))
-			canvas.draw()
-
-	def txt_drag_release(self, event):
-		self.txt_press = None
-
-	def txt_drag_init(self):
-		self.cid1 = self.label.figure.canvas.mpl_connect('pick_event', self.txt_drag_press)
-		self.cid2 = self.label.figure.canvas.mpl_connect('motion_notify_event', self.txt_drag_motion)
-		self.cid3 = self.label.figure.canvas.mpl_connect('button_release_event', self.txt_drag_release)
-
-dls = []
-for label in label_list:
-	dl = DraggableLabel(label)
-	dls.append(dl)
-
-#Draggable Extent
-class DraggableExtent:
-
-	def __init__(self):
-		self.press = None
-
-	def extent_drag_press(self, event):
-		if event.mouseevent.button == 1:
+			self.label.set_position((x0 + dx * self.scale, y0 + dy * self.scale))
+			blitter.update()
+
+		@timings.timed('label drop')
+		def release(self, event):
+			blitter.stop()
+			#Persist manual placement for this ward
+			label_overrides[self.label.get_text()] = list(self.label.get_position())
+			write_label_overrides(label_overrides_path, la_name, label_overrides)
+
+	#Pan Map Extent - anywhere else on the axes
+	class ExtentDrag:
+
+		def press(self, event, ax):
+			if extent_status.get() != 'on': return False
+			#A pending zoom/pan preview may still be showing
+			if blitter.active() and blitter.pan_image is None: return False
 			self.x0, self.x1 = ax.get_xlim()
 			self.y0, self.y1 = ax.get_ylim()
 			self.width = self.x1 - self.x0 
 			self.height = self. y1 - self.y0
-			self.press = event.mouseevent.x, event.mouseevent.y
-
-	def extent_drag_motion(self, event):
-		if self.press != None:
-			mouse_x, mouse_y = self.press
+			self.scale = self.width / ax.bbox.width #metres per pixel, map follows the mouse
+			self.origin = event.x, event.y
+			view_scheduler.begin()
+			return True
+
+		@timings.timed('extent drag')
+		def motion(self, event):
+			mouse_x, mouse_y = self.origin
 			dx = event.x - mouse_x
 			dy = event.y - mouse_y
-			x0 = self.x0 + (-dx*3) 
-			y0 = self.y0 + (-dy*3)
+			x0 = self.x0 + (-dx*self.scale) 
+			y0 = self.y0 + (-dy*self.scale)
 			ax.set_xlim(
 				left=x0, right=x0 + self.width
 			) 
 			ax.set_ylim(
 				bottom=y0, top=y0 + self.height
 			)
-			
-			canvas.draw()
+			blitter.update()
 
-	def extent_drag_release(self, event):
-		self.press = None
-		add_basemap()
-		canvas.draw()
+		@timings.timed('extent drop')
+		def release(self, event):
+			view_scheduler.request()
 
-	def extent_drag_init(self):
-		if extent_status.get() == 'on':
-			self.cid1 = ax.figure.canvas.mpl_connect('pick_event', self.extent_drag_press)
-			self.cid2 = ax.figure.canvas.mpl_connect('motion_notify_event', self.extent_drag_motion)
-			self.cid3 = ax.figure.canvas.mpl_connect('button_release_event', self.extent_drag_release)
-		elif extent_status.get() == 'off':
-			ax.figure.canvas.mpl_disconnect(self.cid1)
-			ax.figure.canvas.mpl_disconnect(self.cid2)
-			ax.figure.canvas.mpl_disconnect(self.cid3)
-
-extent_status = tk.StringVar()
-extent_drag = DraggableExtent()
-extent_toggle = tk.Checkbutton(
-	window, text='Map Extent Toggle', variable=extent_status, onvalue='on', 
-	offvalue='off', command=extent_drag.extent_drag_init
-)
-extent_toggle.deselect()
-extent_toggle.grid(column=2, row=2)
-
-tk.Label(window, text='--Map View--', font='Helvetica 9 bold').grid(column=2, row=1)
-
-#Mousewheel Extent Control
-def extent_control(event):
-	if extent_status.get() == 'off': return
-
-	x0, x1 = ax.get_xlim()
-	y0, y1 = ax.get_ylim()
-	sf = (y1 - y0)/(x1 - x0)
-	#Change limits whilst preserving aspect
-	if event.delta > 0: 
-		x_lim = [x0 + 300, x1 - 300]
-		y_lim = [y0 + (300*sf), y1 - (300*sf)]
-	if event.delta < 0:
-		x_lim = [x0 - 300, x1 + 300]
-		y_lim = [y0 - (300*sf), y1 + (300*sf)]
-		
-	#Set Limits
-	ax.set_xlim(left=x_lim[0], right=x_lim[1])
-	ax.set_ylim(bottom=y_lim[0], top=y_lim[1])
-	add_basemap()
-	canvas.draw()
-
-window.bind("<MouseWheel>", extent_control)
-
-#Make Table Draggable
-class DraggableTable:
-
-	def __init__(self):
-		self.press = None
-		self.plt_drag_init()
-
-	def plt_drag_press(self, event):
-		#Make sure Table is picked 
-		if event.artist != table: return 
-		if event.mouseevent.button == 1:
-			#Get coordinates of table upon press event
-			bbox = table.get_window_extent(renderer=figure.canvas.renderer)
-			self.press = bbox.x0, bbox.y0, event.mouseevent.x, event.mouseevent.y
-			self.dimensions = bbox.width, bbox.height
-
-	def plt_drag_motion(self, event):
-		if self.press != None:
-			#Calculate new coordinates and convert to axes units
-			x0, y0, mouse_x, mouse_y = self.press
-			width, height = self.dimensions
-			dx = event.x - mouse_x
-			dy = event.y - mouse_y
-			loc_in_axes = ax.transAxes.inverted().transform(
-				[(x0 + dx, y0 + dy), (width, height)]
-			)
-			loc_in_axes = [i for element in loc_in_axes for i in element]
-			table._bbox = loc_in_axes
-			canvas.draw()
+	#Priority: label, legend (dragged by matplotlib), then extent pan
+	interactions = InteractionManager(canvas)
+	interactions.add(lambda: label_list, LabelDrag())
+	interactions.add(lambda: [ax.get_legend()], None)
+	interactions.fallback = ExtentDrag()
 
-	def plt_drag_release(self, event):
-		self.press = None
-
-	def plt_drag_init(self):
-		table.figure.canvas.mpl_connect('pick_event', self.plt_drag_press)
-		table.figure.canvas.mpl_connect('motion_notify_event', self.plt_drag_motion)
-		table.figure.canvas.mpl_connect('button_release_event', self.plt_drag_release)
-
-dt = DraggableTable()
-
-#Change Scalebar Position 
-def sb_loc(option):
-	scalebar[0]._location = option
-	canvas.draw()
-
-loc_init = tk.StringVar()
-loc_init.set('lower center')
-loc_options = [
-	'upper right', 'upper left', 'lower left', 'lower right', 
-	'right', 'center left', 'center right', 'lower center', 'upper center', 
-	'center'
-]
-loc_dropdown = tk.OptionMenu(window, loc_init, *loc_options, command=sb_loc)
-loc_dropdown.grid(column=1, row=4)
-
-############################
-#Exporting
-############################
-#Create Fig Image Instances
-def tk_to_plt(label, image):
-	#Tk Coords to Plt
-	x = label.winfo_x()
-	y = frame.winfo_height() - label.winfo_y()
-	offset_y = y - label.winfo_height()
-
-	if export_dpi == dpi:
-		return plt.figimage(
-			image, xo=x, yo=offset_y, origin='upper'
-		)
-	
-	#Else adjust for export dpi
-	width_, height_ = image.size 
-	sf = export_dpi/dpi
-	width = round(width_ * sf)
-	height = round((height_/width_) * width)
-	x *= sf 
-	offset_y *= sf
-
-	return plt.figimage(
-		image.resize((width, height)), xo=x, yo=offset_y, 
-		origin='upper'
+	extent_status = tk.StringVar()
+	extent_toggle = tk.Checkbutton(
+		window, text='Map Extent Toggle', variable=extent_status, onvalue='on', offvalue='off'
 	)
+	extent_toggle.deselect()
+	extent_toggle.grid(column=2, row=2)
 
-def export(*args):
-	#Create Figure Images
-	logo_plt = tk_to_plt(label=logo_label, image=logo_pil)
-	arrow_plt = tk_to_plt(label=arrow_label, image=arrow_pil)
+	tk.Label(window, text='--Map View--', font='Helvetica 9 bold').grid(column=2, row=1)
 
-	if 'single' in args: #export single layer
-		plt.savefig(
-			r'FilePath'.format(layer_ref), dpi=export_dpi
-		)
-		logo_plt.remove()
-		arrow_plt.remove()
-	elif 'all' in args: #export all layers
-		for column in coa_options:
-			#Perform Ops
-			coa_operations(column)
-			#Save Layer
-			plt.savefig(
-				r'FilePath'.format(column), dpi=export_dpi
-			)
-		#Remove FigImage Instances
-		logo_plt.remove()
-		arrow_plt.remove()
+	#Drag Frame Time
+	fps_label = tk.Label(window, text=blitter.frame_stats(), font='Helvetica 8')
+	fps_label.grid(column=2, row=3)
+	lod_label = tk.Label(window, text=lod_stats(), font='Helvetica 8')
+	lod_label.grid(column=2, row=6)
 
-#Export 
-outfile_single = tk.Button(master=window, text='Export Current Layer', command=lambda: export('single'))
-outfile_single.grid(column=3, row=2)
-outfile_all = tk.Button(master=window, text='Export All Layers', command=lambda: export('all'))
-outfile_all.grid(column=3, row=3)
+	#Prefetch Basemap Tiles
+	class TilePrefetch:
 
-tk.Label(window, text='--Export--', font='Helvetica 9 bold').grid(column=3, row=1)
+		def __init__(self):
+			self.thread = None
+			self.status = ''
 
-tk.mainloop()
+		def progress(self, done, total):
+			self.status = 'Tiles: {0}/{1}'.format(done, total)
 
+		def run(self):
+			fetched, total = prefetch_tiles(
+				tile_store, bounds=lnglat_bounds(wards.total_bounds), zooms=prefetch_zooms, provider=tile_provider, 
+				progress=self.progress
+			)
+			self.status = 'Tiles: {0} new of {1}'.format(fetched, total)
+
+		def start(self):
+			if self.thread is not None and self.thread.is_alive(): return
+			self.thread = threading.Thread(target=self.run, daemon=True)
+			self.thread.start()
+			self.poll()
+
+		def poll(self):
+			prefetch_label.config(text=self.status)
+			if self.thread.is_alive(): 
+				window.after(200, self.poll)
+			else:
+				add_basemap()
+				if coa_image.get_visible(): add_coa(layer_ref)
+				canvas.draw()
+
+	tile_prefetch = TilePrefetch()
+	prefetch_button = tk.Button(master=window, text='Prefetch Tiles', command=tile_prefetch.start)
+	prefetch_button.grid(column=2, row=4)
+	prefetch_label = tk.Label(window, text='', font='Helvetica 8')
+	prefetch_label.grid(column=2, row=5)
+
+	#Debounced Extent Changes - scaled preview at once, one full render per burst
+	class ViewScheduler:
+
+		def __init__(self, delay=150):
+			self.delay = delay
+			self.timer = None
+			self.generation = 0
+			self.future = None
+			self.executor = ThreadPoolExecutor(max_workers=1)
+
+		def begin(self):
+			#Snapshot the current render before the extent moves, drop pending work
+			self.generation += 1
+			if self.timer is not None: window.after_cancel(self.timer)
+			self.timer = None
+			if not blitter.active(): blitter.start_pan(ax.get_legend(), scalebar[0])
+
+		def request(self):
+			blitter.update()
+			self.generation += 1
+			if self.timer is not None: window.after_cancel(self.timer)
+			self.timer = window.after(self.delay, self.submit)
+
+		def submit(self):
+			self.timer = None
+			if self.future is not None: self.future.cancel() #not yet started
+			xlim, ylim = ax.get_xlim(), ax.get_ylim()
+			self.future = self.executor.submit(self.prepare, self.generation, xlim, ylim, ax.bbox.width)
+			self.poll(self.future)
+
+		#Worker thread - culling query and tile stitch, no artists touched
+		def prepare(self, generation, xlim, ylim, width):
+			view = query_view(xlim, ylim, abs(xlim[1] - xlim[0]) / width)
+			tiles = stitch_tiles(tile_store, xlim[0], ylim[0], xlim[1], ylim[1], tile_provider)
+			return generation, view, tiles
+
+		def poll(self, future):
+			if future.cancelled(): return
+			if not future.done(): 
+				window.after(20, self.poll, future)
+				return
+			generation, view, tiles = future.result()
+			#Stale, a newer extent is pending
+			if generation != self.generation: return
+			blitter.stop(redraw=False)
+			redraw_extent(view, tiles)
+
+	view_scheduler = ViewScheduler()
+
+	#Mousewheel Extent Control
+	def extent_control(event):
+		if extent_status.get() == 'off': return
+		#Label drag in progress
+		if blitter.active() and blitter.pan_image is None: return
+
+		view_scheduler.begin()
+		x0, x1 = ax.get_xlim()
+		y0, y1 = ax.get_ylim()
+		#Scale about the centre, step proportional to the extent
+		scale = 1 - zoom_step if event.delta > 0 else 1 + zoom_step
+		cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+		half_x, half_y = (x1 - x0) / 2 * scale, (y1 - y0) / 2 * scale
+
+		#Set Limits
+		ax.set_xlim(left=cx - half_x, right=cx + half_x)
+		ax.set_ylim(bottom=cy - half_y, top=cy + half_y)
+		view_scheduler.request()
+
+	window.bind("<MouseWheel>", extent_control)
+
+	#Zoom to a geometry with a margin, keeping the view aspect
+	def zoom_to(geom):
+		if blitter.active() and blitter.pan_image is None: return
+		view_scheduler.begin()
+		x0, x1 = ax.get_xlim()
+		y0, y1 = ax.get_ylim()
+		aspect = (y1 - y0) / (x1 - x0)
+		bx0, by0, bx1, by1 = geom.bounds
+		cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+		half_x = max(bx1 - bx0, (by1 - by0) / aspect) / 2 * 1.2
+		ax.set_xlim(left=cx - half_x, right=cx + half_x)
+		ax.set_ylim(bottom=cy - half_x * aspect, top=cy + half_x * aspect)
+		view_scheduler.request()
+
+	#Change Scalebar Position 
+	def sb_loc(option):
+		scalebar[0]._location = option
+		canvas.draw()
 
+	loc_init = tk.StringVar()
+	loc_init.set('lower center')
+	loc_options = [
+		'upper right', 'upper left', 'lower left', 'lower right', 
+		'right', 'center left', 'center right', 'lower center', 'upper center', 
+		'center'
+	]
+	loc_dropdown = tk.OptionMenu(window, loc_init, *loc_options, command=sb_loc)
+	loc_dropdown.grid(column=1, row=4)
+
+	#Attribute Table Position in exports
+	table_loc = tk.StringVar()
+	table_loc.set('lower left')
+	table_loc_dropdown = tk.OptionMenu(window, table_loc, *loc_options)
+	table_loc_dropdown.grid(column=1, row=5)
+
+	############################
+	#Exporting
+	############################
+	#Tk placement as a figure fraction extent, the same at any export dpi
+	def overlay_spec(label, image, source):
+		width, height = figure.get_size_inches() * dpi
+		x = label.winfo_x()
+		y = frame.winfo_height() - label.winfo_y()
+		offset_y = y - label.winfo_height()
+
+		return source, [x / width, offset_y / height, image.size[0] / width, image.size[1] / height]
+
+	#Create Fig Image Instances
+	def tk_to_plt(label, image, source):
+		return draw_overlay(figure, *overlay_spec(label, image, source))
+
+	#Picklable description of the current static figure for headless workers
+	def figure_spec():
+		legend = ax.get_legend()
+		return {
+			'rc': text_rc['usetex' if print_usetex else 'mathtext'],
+			'figsize': tuple(figure.get_size_inches()), 'dpi': dpi, 
+			'xlim': ax.get_xlim(), 'ylim': ax.get_ylim(),
+			'basemap': (np.asarray(basemap.get_array()), basemap.get_extent()),
+			'coa_paths': coa_lod[0][1], 
+			'ward_paths': ward_lod[0][1],
+			'labels': [(x.get_text(), *x.get_position()) for x in label_list],
+			'table': {
+				'cell_text': attribute_table.cell_text(), 'col_labels': list(table_data.columns), 
+				'col_widths': table_col_widths, 'loc': table_loc.get(), 'visible': table_status.get() == 'on'
+			},
+			'scalebar': {'location': scalebar[0]._location, 'visible': scalebar[0].get_visible()},
+			'overlays': [
+				overlay_spec(label=logo_label, image=logo_pil, source=logo_source), 
+				overlay_spec(label=arrow_label, image=arrow_pil, source=arrow_source)
+			],
+			'colors': coa_colors, 
+			'legends': {
+				option: (legend_labels(get_class(option), option), legend_colors(option)) \
+				for option in coa_options[1:]
+			},
+			'legend_loc': legend._loc if legend is not None else 'upper left'
+		}
+
+	#Export All Layers across worker processes
+	class ExportJob:
+
+		def __init__(self):
+			self.executor = None
+			self.futures = []
+			self.manifest = ExportManifest(export_manifest_path)
+
+		def running(self):
+			return any(not f.done() for f in self.futures)
+
+		def start(self, poster=False, atlas=False):
+			if self.running(): return
+			spec = figure_spec()
+			#Poster of the current layer streamed in strips, every layer as one PDF, or every layer at export dpi
+			if poster:
+				fingerprints = layer_fingerprints(spec, [layer_ref], (poster_width, poster_dpi))
+				outputs = [(layer_ref, poster_path.format(layer_ref), fingerprints[layer_ref])]
+				render, args = render_poster, (poster_width, poster_dpi, poster_strip_bytes)
+			elif atlas:
+				outputs = [(coa_options, atlas_path, atlas_fingerprint(spec, coa_options, export_dpi))]
+				render, args = render_atlas, (export_dpi,)
+			else:
+				fingerprints = layer_fingerprints(spec, coa_options, export_dpi)
+				outputs = [(column, export_path.format(column), fingerprints[column]) for column in coa_options]
+				render, args = render_layer, (export_dpi,)
+			#Only outputs whose fingerprint or file changed since the last export
+			self.stale = [x for x in outputs if not self.manifest.current(x[1], x[2])]
+			self.reused = len(outputs) - len(self.stale)
+			self.futures = []
+			if not self.stale:
+				export_label.config(text='Unchanged, {0} layers reused'.format(self.reused))
+				return
+			#Spawned on every platform, forking would copy the Tk and worker threads of this process
+			self.executor = ProcessPoolExecutor(
+				mp_context=multiprocessing.get_context('spawn'), 
+				initializer=init_worker, initargs=(spec,)
+			)
+			self.futures = [
+				self.executor.submit(render, column, path, *args) for column, path, fingerprint in self.stale
+			]
+			self.poll()
+
+		def poll(self):
+			done = sum(f.done() for f in self.futures)
+			export_label.config(text='Exported {0}/{1}, {2} reused'.format(done, len(self.futures), self.reused))
+			if done < len(self.futures): 
+				window.after(200, self.poll)
+				return
+			self.executor.shutdown(wait=False)
+			rebuilt = 0
+			for f, (column, path, fingerprint) in zip(self.futures, self.stale):
+				if f.cancelled() or f.exception(): continue
+				self.manifest.record(path, fingerprint)
+				rebuilt += 1
+			self.manifest.save()
+			cancelled = sum(f.cancelled() for f in self.futures)
+			failed = [f.exception() for f in self.futures if not f.cancelled() and f.exception()]
+			if cancelled: 
+				export_label.config(text='Cancelled, {0}/{1} exported'.format(done - cancelled, len(self.futures)))
+			elif failed:
+				export_label.config(text='Export failed: {0}'.format(failed[0]))
+			else:
+				export_label.config(text='{0} layers rebuilt, {1} reused'.format(rebuilt, self.reused))
+
+		def cancel(self):
+			if self.executor is None: return
+			for f in self.futures: f.cancel()
+			self.executor.shutdown(wait=False, cancel_futures=True)
+
+	export_job = ExportJob()
+
+	@timings.timed('export')
+	def export(*args):
+		if 'all' in args: #export all layers in background
+			export_job.start()
+			return
+		if 'poster' in args: #print size, streamed in strips in background
+			export_job.start(poster=True)
+			return
+		if 'atlas' in args: #every layer as one vector PDF in background
+			export_job.start(atlas=True)
+			return
+
+		#Print quality text goes through the headless renderer with LaTeX
+		if print_usetex:
+			init_worker(figure_spec())
+			render_layer(layer_ref, export_path.format(layer_ref), export_dpi)
+			return
+
+		#Create Figure Images and Table
+		logo_plt = tk_to_plt(label=logo_label, image=logo_pil, source=logo_source)
+		arrow_plt = tk_to_plt(label=arrow_label, image=arrow_pil, source=arrow_source)
+		table = None
+		if table_status.get() == 'on':
+			table = draw_table(
+				ax, attribute_table.cell_text(), list(table_data.columns), 
+				col_widths=table_col_widths, loc=table_loc.get()
+			)
+		#Export single layer from vectors at full detail
+		update_view(pixel_size=0)
+		coa_collection.set_visible(coa_image.get_visible())
+		coa_image.set_visible(False)
+		basemap.set_visible(True)
+		plt.savefig(
+			export_path.format(layer_ref), dpi=export_dpi
+		)
+		coa_image.set_visible(coa_collection.get_visible())
+		basemap.set_visible(not coa_image.get_visible())
+		coa_collection.set_visible(False)
+		update_view()
+		logo_plt.remove()
+		arrow_plt.remove()
+		if table is not None: table.remove()
+
+	#Export 
+	outfile_single = tk.Button(master=window, text='Export Current Layer', command=lambda: export('single'))
+	outfile_single.grid(column=3, row=2)
+	outfile_all = tk.Button(master=window, text='Export All Layers', command=lambda: export('all'))
+	outfile_all.grid(column=3, row=3)
+	outfile_cancel = tk.Button(master=window, text='Cancel Export', command=export_job.cancel)
+	outfile_cancel.grid(column=3, row=4)
+	outfile_poster = tk.Button(master=window, text='Export Poster', command=lambda: export('poster'))
+	outfile_poster.grid(column=3, row=5)
+	outfile_atlas = tk.Button(master=window, text='Export Atlas', command=lambda: export('atlas'))
+	outfile_atlas.grid(column=3, row=6)
+	export_label = tk.Label(window, text='', font='Helvetica 8')
+	export_label.grid(column=3, row=7)
+
+	tk.Label(window, text='--Export--', font='Helvetica 9 bold').grid(column=3, row=1)
+
+	############################
+	#Timing Overlay
+	############################
+	#Last and p95 per hot path stage over the map, refreshed while shown
+	class TimingOverlay:
+
+		def __init__(self, interval=500):
+			self.interval = interval
+			self.job = None
+			self.label = tk.Label(
+				master=frame, font='Courier 8', justify='left', bg='white', relief='solid', bd=1
+			)
 
+		def toggle(self):
+			if overlay_status.get() == 'on':
+				self.label.place(relx=0, rely=1, x=5, y=-5, anchor='sw')
+				self.refresh()
+			else:
+				if self.job is not None: window.after_cancel(self.job)
+				self.job = None
+				self.label.place_forget()
+
+		def refresh(self):
+			self.label.config(text=timings.summary(fps_stages=('canvas.draw', 'blit frame')))
+			self.job = window.after(self.interval, self.refresh)
+
+	def save_trace():
+		count = timings.dump(trace_path)
+		trace_label.config(text='{0} timings saved to {1}'.format(count, os.path.basename(trace_path)))
+
+	timing_overlay = TimingOverlay()
+	overlay_status = tk.StringVar()
+	overlay_toggle = tk.Checkbutton(
+		window, text='Timing Overlay', variable=overlay_status, onvalue='on', offvalue='off', 
+		command=timing_overlay.toggle
+	)
+	overlay_toggle.deselect()
+	overlay_toggle.grid(column=4, row=2)
+	trace_button = tk.Button(master=window, text='Save Timing Trace', command=save_trace)
+	trace_button.grid(column=4, row=3)
+	trace_label = tk.Label(window, text='' if timings.enabled else 'Timings off in map_config', font='Helvetica 8')
+	trace_label.grid(column=4, row=4)
+	if not timings.enabled:
+		overlay_toggle.config(state='disabled')
+		trace_button.config(state='disabled')
+
+	tk.Label(window, text='--Diagnostics--', font='Helvetica 9 bold').grid(column=4, row=1)
+
+	############################
+	#Session
+	############################
+	#Layout and view saved shortly after each change with the rendered map, restored at the next start
+	class Session:
+
+		def __init__(self, saved, delay=1000):
+			self.saved = saved
+			self.delay = delay
+			self.timer = None
+
+		def state(self):
+			legend = ax.get_legend()
+			legend_loc = legend._loc if legend is not None else None
+			return {
+				'layer': layer_ref, 'xlim': list(ax.get_xlim()), 'ylim': list(ax.get_ylim()),
+				'legend_loc': list(legend_loc) if isinstance(legend_loc, tuple) else legend_loc,
+				'labels': {text: list(position) for text, position in label_overrides.items()},
+				'scalebar': {'location': scalebar[0]._location, 'visible': sb_status.get()},
+				'table': {'visible': table_status.get(), 'loc': table_loc.get()},
+				'extent_toggle': extent_status.get(),
+				'logo': [logo_label.winfo_x(), logo_label.winfo_y()],
+				'arrow': [arrow_label.winfo_x(), arrow_label.winfo_y()]
+			}
+
+		#Bursts of changes, e.g. a drag then a redraw, make one save
+		def changed(self, *args):
+			if self.timer is not None: window.after_cancel(self.timer)
+			self.timer = window.after(self.delay, self.save)
+
+		def save(self):
+			self.timer = None
+			#Mid drag or pan the canvas holds a blitted frame, not the map
+			if blitter.active():
+				self.changed()
+				return
+			state = self.state()
+			if state == self.saved: return
+			buffer = np.asarray(canvas.buffer_rgba())
+			raster = session_raster_path.format(la_name)
+			with image_stream(raster + '.part', buffer.shape[1], buffer.shape[0], figure.dpi) as stream:
+				stream.write(buffer)
+			os.replace(raster + '.part', raster)
+			write_session(session_path, la_name, state)
+			self.saved = state
+
+		#Widgets and artists to a saved state, the extent was set before the first render and ward labels 
+		#come back from label_overrides, the state only records them so a drop refreshes the raster
+		def restore(self, state):
+			global layer_ref
+			for toggle, value in [(sb_toggle, state['scalebar']['visible']), (table_toggle, state['table']['visible']), \
+				(extent_toggle, state['extent_toggle'])]:
+				if value == 'on': toggle.select()
+				else: toggle.deselect()
+			scalebar[0].set_visible(state['scalebar']['visible'] == 'on')
+			scalebar[0]._location = state['scalebar']['location']
+			loc_init.set(state['scalebar']['location'])
+			table_loc.set(state['table']['loc'])
+			for label, (x, y) in [(logo_label, state['logo']), (arrow_label, state['arrow'])]:
+				if 0 <= x < frame.winfo_width() and 0 <= y < frame.winfo_height(): label.place(x=x, y=y)
+			#Layer as coa_operations shows it, one draw for everything
+			if state['layer'] in coa_options[1:]:
+				layer_ref = state['layer']
+				coa_init.set(layer_ref)
+				add_coa(layer_ref)
+				add_legend(layer_ref)
+				loc = state['legend_loc']
+				if loc is not None: ax.get_legend()._loc = tuple(loc) if isinstance(loc, list) else loc
+				cache_label.config(text=layer_cache.stats())
+			canvas.draw()
 
+		#Pending changes saved before the window goes
+		def close(self):
+			if self.timer is not None:
+				window.after_cancel(self.timer)
+				self.timer = None
+				if not blitter.active(): self.save()
+			window.destroy()
+
+	session_state = Session(saved=session)
+	if session is not None: session_state.restore(session)
+	if startup_preview is not None: startup_preview.destroy()
+	#Every full draw may follow a change, unchanged states are not written
+	canvas.mpl_connect('draw_event', session_state.changed)
+	for variable in (table_status, table_loc, extent_status): variable.trace_add('write', session_state.changed)
+	for label in (logo_label, arrow_label): label.bind('<ButtonRelease-1>', session_state.changed, add='+')
+	window.protocol('WM_DELETE_WINDOW', session_state.close)
+
+	#Startup Profile Report
+	startup_profile.append(('ready at', time.perf_counter() - startup_time))
+	print('Startup profile ({0})'.format(la_name))
+	for stage, seconds in startup_profile: print('  {0:<28}{1:8.3f}s'.format(stage, seconds))
+	print('  reprojected {0}'.format(dict(reprojections) or 'none, layers cached in display CRS'))
+	print('  session {0}'.format(
+		'restored, last view shown from cache while loading' if startup_preview is not None else \
+		'restored' if session is not None else 'none saved'
+	))
+	for tier, (tolerance, paths, vertices) in enumerate(coa_lod):
+		print('  LOD {0} ({1:>3} m){2:>16,} COA vertices{3:>12,} ward vertices'.format(
+			tier, tolerance, vertices, ward_lod[tier][2]
+		))
+
+	tk.mainloop()